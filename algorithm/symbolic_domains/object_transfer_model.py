@@ -3,8 +3,9 @@ from typing import List
 from common.structures import Transition
 
 from symbolic_stochastic_domains.symbolic_classes import Example, Outcome
-from symbolic_stochastic_domains.object_transfer import get_possible_object_assignments,\
-    determine_possible_object_maps, determine_transition_given_action
+from symbolic_stochastic_domains.object_transfer import get_possible_object_assignments, determine_transition_given_action
+from symbolic_stochastic_domains.object_constraints import ObjectMapConstraints
+from symbolic_stochastic_domains.prediction_cache import PredictionCache
 
 
 class ObjectTransferModel:
@@ -28,7 +29,14 @@ class ObjectTransferModel:
 
         self.solved = False  # Whether the object_map is now one to one
 
+        # Goes up by one every time the object map changes. Planners compare it to know when to replan
+        self.version = 0
+
+        # What the previous rules say will happen, by literal signature and action, for the current object map
+        self.predictions = PredictionCache()
+
         self.object_map = {}
+        self.constraints = None  # The object map as constraints, so only what changed needs to be looked at again
         self.init_object_map()  # Setup object map
 
     def init_object_map(self):
@@ -43,6 +51,10 @@ class ObjectTransferModel:
                         value2.remove(key)
                 self.object_map[key] = [key]
 
+        self.constraints = ObjectMapConstraints(self.object_map, self.prior_object_names)
+        self.object_map = self.constraints.object_map()
+        self.version += 1
+
         # If I pass in for known_objects every object, then the environment is solved from the start
         self.solved = sum(len(possibilities) for possibilities in self.object_map.values()) == len(self.prior_object_names)
 
@@ -57,15 +69,17 @@ class ObjectTransferModel:
         print(example)
 
         assignments = get_possible_object_assignments(example, self.previous_ruleset)
+        new_assignments = [assignment for assignment in assignments if assignment not in self.possible_assignments]
         self.possible_assignments.update(assignments)
         print("All assignments: ")
         print(self.possible_assignments)
         print()
 
-        # Pare down the object map
+        # Pare down the object map. Only the new assignments, and old ones about objects that changed, get checked
         length_of_beliefs = sum(len(possibilities) for possibilities in self.object_map.values())
-        new_object_map = determine_possible_object_maps(self.object_map, self.possible_assignments)
-        self.object_map = new_object_map
+        if self.constraints.add_constraints(new_assignments):
+            self.version += 1
+            self.object_map = self.constraints.object_map()
         new_lengths_of_beliefs = sum(len(possibilities) for possibilities in self.object_map.values())
 
         if new_lengths_of_beliefs != length_of_beliefs:
@@ -88,7 +102,10 @@ class ObjectTransferModel:
         if literals is None or instance_name_map is None:
             literals, instance_name_map = self.env.get_literals(state)
 
-        transitions = determine_transition_given_action(self.env, state, action, self.object_map, self.previous_ruleset, literals=literals)
+        # Only depends on what the literals look like, so states that look the same share the answer
+        transitions = self.predictions.get(self.version, literals, action, lambda: determine_transition_given_action(
+            self.env, state, action, self.object_map, self.previous_ruleset, literals=literals
+        ))
 
         if transitions is None:
             return []
@@ -98,56 +115,37 @@ class ObjectTransferModel:
         # Maps unique object name in the tree, to the real instance index in the environment
         name_instance_map = {v: k for k, v in instance_name_map.items()}
 
+        schema = self.env.get_schema()
+        _, by_edge_type = literals.references()
+
         # Loop over all possible transitions (i.e., if we don't know what the object is, it could
         # transition to a state where a gem or key is picked up), and generate an effect for each
         for transition in transitions:
             atts = []
-            outcomes = []
 
             effect = transition
 
-            for reference, outcome in effect.value.items():
-                edge_type = reference.edge_type
-                to_ob = reference.to_ob
-                att_name = reference.att_name
-
-                unique_name = ""
+            for reference in effect.value.keys():
                 # We handle the taxi case separately, as it isn't attached to anything
-                if edge_type is None:
+                if reference.edge_type is None:
                     unique_name = "taxi0"
                     known_class_name = "taxi"  # This is only used so the env can say which attribute is which index
                 else:
                     # Use the fact that only one object can be at the end of each relation to figure out what
                     # the desired object is in this state
-                    for edge in literals.base_object.edges:
-                        if edge.type == edge_type:
-                            unique_name = edge.to_node.full_name()
-                            break
+                    unique_name = by_edge_type.get(reference.edge_type, "")
 
                     # This is only used so the env can say which attribute is which index
                     # `taxi-IN-key`, will extract `key`
-                    # Probably this should be a helper function in the env
-                    known_class_name = to_ob
-
-                    # unique_name = class_name + str(test_id)
+                    known_class_name = reference.to_ob
                 assert unique_name != "", "We should have found a match"
 
-                # Do some weird indices hacks to figure out which attribute index is being referred to
-                # so the env can directly modify the imagined state.
-                class_idx = self.env.OB_NAMES.index(known_class_name)
-
-                att_idx = self.env.ATT_NAMES[class_idx].index(att_name)
-                instance_id = name_instance_map[unique_name]
-
-                att_range = self.env.instance_index_map[instance_id]
-                att = att_range[0] + att_idx
-
-                atts.append(att)
-                outcomes.append(outcome)
+                # Figure out which attribute index is being referred to so the env can directly modify the imagined state
+                atts.append(schema.attribute(known_class_name, reference.att_name, name_instance_map[unique_name]))
 
             # Only create new effect if it isn't a JointNoEffect
             if len(atts) > 0:
-                effect = Outcome(atts, outcomes)
+                effect = schema.ground(effect, atts)
 
             all_effects.append(effect)
 
@@ -4,22 +4,28 @@ Created on 2/5/23 by Ethan Frank
 Model for simplest explanation object discovery
 """
 
-from typing import List
+from typing import List, Tuple, Dict
 
 from common.structures import Transition
 
 from symbolic_stochastic_domains.symbolic_classes import Example, Outcome, RuleSet, ExampleSet, PredicateTree
 from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
 from symbolic_stochastic_domains.object_transfer import determine_transition_given_action, determine_transition_given_action_2
-from test.simplicity_object_transfer.simplest_explanation_based_object_transfer import get_object_permutation_rule_complexities
+from test.simplicity_object_transfer.simplest_explanation_based_object_transfer import get_object_permutation_rule_complexities,\
+    PermutationWorkers, ContradictionIndex, default_num_workers
 from symbolic_stochastic_domains.experience_helper import ExperienceHelper
+from symbolic_stochastic_domains.prediction_cache import PredictionCache
+from symbolic_stochastic_domains.ruleset_memo import RulesetMemo
+
+# Stands in for every known object a ruleset doesn't mention, see hypotheses
+UNMENTIONED = "?"
 
 
 class SimplestExplanationModel:
     """Tracks interactions with the world with Examples and Experience"""
 
     def __init__(self, env, previous_ruleset: RuleSet, previous_examples: ExampleSet,
-                 previous_experiences: ExperienceHelper):
+                 previous_experiences: ExperienceHelper, num_workers: int = None):
         self.env = env
 
         self.num_actions = self.env.get_num_actions()
@@ -30,6 +36,21 @@ class SimplestExplanationModel:
         self.previous_examples = previous_examples
         self.previous_experiences = previous_experiences
 
+        # Processes for learning the rulesets for each permutation in parallel, if more than one. See close
+        if num_workers is None:
+            num_workers = default_num_workers()
+        self.workers = PermutationWorkers(num_workers, previous_ruleset, previous_examples) if num_workers > 1 else None
+
+        # Outcomes of the previous examples by state, for finding permutations that contradict them
+        self.contradictions = ContradictionIndex(previous_examples)
+
+        # Rulesets already learned for each set of remapped examples, most are the same from one step to the next
+        self.learned_rulesets = RulesetMemo()
+
+        # What the learner gets from just the previous examples. Each permutation only relearns the outcomes it changes
+        # starting from this. The previous ruleset might not be exactly this, so it can't be used
+        self.warm_start = RulesetLearner().learn_ruleset(previous_examples)
+
         # New examples in target task
         self.new_examples = ExampleSet()
         self.new_experience_helper = ExperienceHelper()  # Keeps track of object, predicate, action, counts
@@ -53,6 +74,17 @@ class SimplestExplanationModel:
         # True if all permutations on previous object mappings required a ruleset with increased complexity
         self.ruleset_had_to_change = False
 
+        # Goes up by one every time the object map or best rulesets change. See belief_key
+        self.version = 0
+        self.last_belief_key = self.belief_key()
+
+        # What the best rulesets say will happen, by literal signature and action, for the current beliefs
+        self.predictions = PredictionCache()
+
+        # The distinct hypotheses in best_rulesets, and the version of the beliefs they were found for. See hypotheses
+        self.distinct_hypotheses = []
+        self.hypotheses_version = None
+
     def add_experience(self, action: int, state: int, outcome: Outcome):
         """Records experience of state action transition"""
 
@@ -83,7 +115,8 @@ class SimplestExplanationModel:
         learner = RulesetLearner()
         complexities, permutations, rulesets = get_object_permutation_rule_complexities(
             mappings_to_choose_from, self.previous_ruleset, self.previous_examples,
-            self.new_examples, learner, state_objects
+            self.new_examples, learner, state_objects, workers=self.workers, index=self.contradictions,
+            memo=self.learned_rulesets, warm_start=self.warm_start
         )
 
         for complexity, permutation in zip(complexities, permutations):
@@ -119,7 +152,8 @@ class SimplestExplanationModel:
             learner = RulesetLearner()
             complexities, permutations, rulesets = get_object_permutation_rule_complexities(
                 mappings_to_choose_from, self.previous_ruleset, self.previous_examples,
-                self.new_examples, learner, state_objects
+                self.new_examples, learner, state_objects, workers=self.workers, index=self.contradictions,
+                memo=self.learned_rulesets, warm_start=self.warm_start
             )
 
             for complexity, permutation in zip(complexities, permutations):
@@ -161,6 +195,18 @@ class SimplestExplanationModel:
         if new_lengths_of_beliefs != length_of_beliefs:
             print("Learned something new")
 
+        belief_key = self.belief_key()
+        if belief_key != self.last_belief_key:
+            self.version += 1
+            self.last_belief_key = belief_key
+
+    def belief_key(self):
+        """Everything predictions depend on. The object map gets modified in place so it has to be copied out"""
+        object_map = tuple((unknown, tuple(knowns)) for unknown, knowns in self.object_map.items())
+        best_rulesets = tuple((permutation, ruleset.rules_key(), tuple(seen_objects))
+                              for permutation, (ruleset, seen_objects) in self.best_rulesets.items())
+        return object_map, best_rulesets
+
     def compute_possible_transitions(self, state: int, action: int, literals=None, instance_name_map=None) -> List[Transition]:
         """
         Returns the effects (transitions) of taking the action given the condition
@@ -171,7 +217,10 @@ class SimplestExplanationModel:
         if literals is None or instance_name_map is None:
             literals, instance_name_map = self.env.get_literals(state)
 
-        transitions = self.get_outcomes_using_rulesets(state, action, literals)
+        # Only depends on what the literals look like, so states that look the same share the answer
+        transitions = self.predictions.get(
+            self.version, literals, action, lambda: self.get_outcomes_using_rulesets(state, action, literals)
+        )
 
         if transitions is None:
             return []
@@ -181,56 +230,37 @@ class SimplestExplanationModel:
         # Maps unique object name in the tree, to the real instance index in the environment
         name_instance_map = {v: k for k, v in instance_name_map.items()}
 
+        schema = self.env.get_schema()
+        _, by_edge_type = literals.references()
+
         # Loop over all possible transitions (i.e., if we don't know what the object is, it could
         # transition to a state where a gem or key is picked up), and generate an effect for each
         for transition in transitions:
             atts = []
-            outcomes = []
 
             effect = transition
 
-            for reference, outcome in effect.value.items():
-                edge_type = reference.edge_type
-                to_ob = reference.to_ob
-                att_name = reference.att_name
-
-                unique_name = ""
+            for reference in effect.value.keys():
                 # We handle the taxi case separately, as it isn't attached to anything
-                if edge_type is None:
+                if reference.edge_type is None:
                     unique_name = "taxi0"
                     known_class_name = "taxi"  # This is only used so the env can say which attribute is which index
                 else:
                     # Use the fact that only one object can be at the end of each relation to figure out what
                     # the desired object is in this state
-                    for edge in literals.base_object.edges:
-                        if edge.type == edge_type:
-                            unique_name = edge.to_node.full_name()
-                            break
+                    unique_name = by_edge_type.get(reference.edge_type, "")
 
                     # This is only used so the env can say which attribute is which index
                     # `taxi-IN-key`, will extract `key`
-                    # Probably this should be a helper function in the env
-                    known_class_name = to_ob
-
-                    # unique_name = class_name + str(test_id)
+                    known_class_name = reference.to_ob
                 assert unique_name != "", "We should have found a match"
 
-                # Do some weird indices hacks to figure out which attribute index is being referred to
-                # so the env can directly modify the imagined state.
-                class_idx = self.env.OB_NAMES.index(known_class_name)
-
-                att_idx = self.env.ATT_NAMES[class_idx].index(att_name)
-                instance_id = name_instance_map[unique_name]
-
-                att_range = self.env.instance_index_map[instance_id]
-                att = att_range[0] + att_idx
-
-                atts.append(att)
-                outcomes.append(outcome)
+                # Figure out which attribute index is being referred to so the env can directly modify the imagined state
+                atts.append(schema.attribute(known_class_name, reference.att_name, name_instance_map[unique_name]))
 
             # Only create new effect if it isn't a JointNoEffect
             if len(atts) > 0:
-                effect = Outcome(atts, outcomes)
+                effect = schema.ground(effect, atts)
 
             all_effects.append(effect)
 
@@ -241,27 +271,61 @@ class SimplestExplanationModel:
 
         return all_transitions
 
-    def get_outcomes_using_rulesets(self, state: int, action: int, literals: PredicateTree) -> List[Outcome]:
-        # Iterate over each ruleset. Reduce the object map as required. Pass that into the thingy. Does the permutations
+    def hypotheses(self) -> List[Tuple[RuleSet, Dict[str, List[str]]]]:
+        """
+        The distinct (ruleset, object map) pairs the best rulesets predict with, in order. Lots of permutations end up
+        with the same rules and the same object map once the permutation is filled in and the knowns the rules never
+        mention are merged, and those always predict the same thing, so they only need checking once.
+        Rebuilt when the beliefs change
+        """
+        if self.hypotheses_version == self.version:
+            return self.distinct_hypotheses
 
-        all_outcomes = []
+        self.distinct_hypotheses = []
+        seen = set()
         for permutation, (ruleset, seen_objects) in self.best_rulesets.items():
             object_map = {key: value.copy() for key, value in self.object_map.items()}
 
             for seen_object, permute_object in zip(seen_objects, permutation):
                 object_map[seen_object] = [permute_object]
 
+            # Rules can only tell apart the knowns their contexts mention, the rest may as well be the same one
+            mentioned = set()
+            for rule in ruleset.rules:
+                for node in rule.context.nodes:
+                    mentioned.add(node.object_name)
+                    mentioned.update(edge.to_node.object_name for edge in node.negative_edges)
+
+            object_map = {unknown: list(dict.fromkeys(known if known in mentioned else UNMENTIONED for known in knowns))
+                          for unknown, knowns in object_map.items()}
+
+            key = (ruleset.rules_key(), tuple((unknown, tuple(knowns)) for unknown, knowns in object_map.items()))
+            if key not in seen:
+                seen.add(key)
+                self.distinct_hypotheses.append((ruleset, object_map))
+
+        self.hypotheses_version = self.version
+        return self.distinct_hypotheses
+
+    def get_outcomes_using_rulesets(self, state: int, action: int, literals: PredicateTree) -> List[Outcome]:
+        """
+        The outcome every hypothesis agrees on (in a list), or None if any of them don't know or they disagree.
+        The outcome is the first hypothesis's
+        """
+        agreed = None
+        for ruleset, object_map in self.hypotheses():
             # It considers applicable rules to be ones with the same action, that's why it returns all types
             outcome = determine_transition_given_action_2(action, object_map, ruleset, literals)
 
-            all_outcomes.append(outcome)
+            # Only compare result to see if the outcomes are the same
+            # TODO: this should really compare diectic references, or remap back to original,
+            if outcome is None or (agreed is not None and list(outcome.value.values()) != list(agreed.value.values())):
+                return None
 
-        # Only compare result to see if the outcomes are the same
-        # TODO: this should really compare diectic references, or remap back to original,
-        all_the_same = all(outcome is not None and list(outcome.value.values()) == list(all_outcomes[0].value.values()) for outcome in all_outcomes)
-        all_outcomes = all_outcomes if all_the_same else None
+            if agreed is None:
+                agreed = outcome
 
-        return all_outcomes
+        return [agreed] if agreed is not None else None
 
     def get_reward(self, state: int, next_state: int, action: int):
         """Assumes all rewards are known in advance"""
@@ -282,3 +346,8 @@ class SimplestExplanationModel:
 
     def save(self, filepath):
         raise NotImplementedError("Save not implemented for object transfer model")
+
+    def close(self):
+        """Stops the worker processes, if there are any. With workers, the model can't learn from new experiences after this"""
+        if self.workers is not None:
+            self.workers.close()
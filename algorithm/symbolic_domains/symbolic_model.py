@@ -14,7 +14,7 @@ from symbolic_stochastic_domains.experience_helper import ExperienceHelper
 class SymbolicModel:
     """Tracks interactions with the world with Examples and Experience"""
 
-    def __init__(self, env):
+    def __init__(self, env, incremental: bool = False):
         self.env = env
 
         self.num_actions = self.env.get_num_actions()
@@ -26,10 +26,39 @@ class SymbolicModel:
         # An experience helper keeps track of object, predicate, action, counts
         self.experience_helper = ExperienceHelper()
 
+        # Goes up by one every time the rules change. Planners compare it to know when to replan
+        self.version = 0
+
         # Current beleived set of rules that describe environment
         # Need to init with a default rule or we get out of bounds errors with the list
         self.ruleset = RuleSet([Rule(action=-1, context=[], outcomes=OutcomeSet())])
 
+        # In incremental mode, only the rules for the outcomes the new example is relevant to are relearned.
+        # See update_ruleset_incrementally
+        self.incremental = incremental
+        self.learner = RulesetLearner()
+
+    @property
+    def ruleset(self) -> RuleSet:
+        return self.current_ruleset
+
+    @ruleset.setter
+    def ruleset(self, ruleset: RuleSet):
+        # Relearning usually gives back the same rules, so only count it as a change if they are different
+        current_ruleset = self.__dict__.get("current_ruleset")
+        if current_ruleset is None or current_ruleset.rules_key() != ruleset.rules_key():
+            self.version += 1
+
+        self.current_ruleset = ruleset
+
+    def __setstate__(self, state):
+        # Models pickled before versions stored the ruleset directly
+        if "ruleset" in state:
+            state["current_ruleset"] = state.pop("ruleset")
+            state["version"] = 1
+
+        self.__dict__.update(state)
+
     def add_experience(self, action: int, state: int, outcome: Outcome):
         """Records experience of state action transition"""
 
@@ -42,11 +71,13 @@ class SymbolicModel:
         self.experience_helper.update_experience_dict(example, 1)
         self.experience_helper.update_experience_dict(example, 2)
 
-        # Currently, update the model on every step. I wonder how it would work to update it based
-        # on the existing ruleset
         start_time = time.perf_counter()
-        learner = RulesetLearner()
-        self.ruleset = learner.learn_ruleset(self.examples)
+        if self.incremental:
+            self.update_ruleset_incrementally(example)
+        else:
+            # Update the model on every step by relearning everything from scratch
+            learner = RulesetLearner()
+            self.ruleset = learner.learn_ruleset(self.examples)
         end_time = time.perf_counter()
         # print(f"Ruleset learning took {end_time - start_time:.3f} (# of examples {len(self.examples.examples)})")
 
@@ -54,6 +85,38 @@ class SymbolicModel:
         # self.print_model()
         # print()
 
+    def update_ruleset_incrementally(self, example: Example):
+        """
+        Updates the ruleset using only the parts of the example set that the new example could have changed.
+        An outcome's rules depend on its relevant examples (the ones with that outcome) and irrelevant ones (same action,
+        other outcome), and their counts. So only the rules for the example's outcome and the other outcomes of its
+        action are relearned, even if the example was already there or the rules already predict it, and the rest are
+        kept. The ruleset is exactly what a full relearn would give.
+        """
+        # Nothing has been learned yet, there is only the default rule, so there aren't any rules to keep
+        learned = not any(rule.action == -1 for rule in self.ruleset.rules)
+
+        # If a new object was referenced, every rule gets new candidate literals, so start over
+        # Same check as RulesetLearner.learn_ruleset_delta
+        if not learned or self.examples.referenced_object_names() != self.learner.object_names:
+            self.ruleset = self.learner.learn_ruleset(self.examples)
+        else:
+            self.ruleset = self.learner.relearn_outcomes(self.ruleset, self.examples, [example])
+
+    def predict_outcome(self, literals, action: int) -> Outcome:
+        """
+        Returns the outcome the ruleset predicts for the literals and action. If no rule applies,
+        nothing happens. If more than one rule applies, we can't say, so return None
+        """
+        outcome = Outcome([], [], no_effect=True)
+        matches = 0
+        for rule in self.ruleset.candidate_rules(action, literals):
+            if context_matches(rule.context, literals):
+                outcome = rule.outcomes.outcomes[0]
+                matches += 1
+
+        return outcome if matches < 2 else None
+
     def compute_possible_transitions(self, state: int, action: int, literals=None, instance_name_map=None) -> List[Transition]:
         """
         Returns the effects (transitions) of taking the action given the condition
@@ -70,9 +133,9 @@ class SymbolicModel:
 
         # Check for rules that are applicable to the current state and action
         rule = None
-        for test_rule in self.ruleset.rules:
+        for test_rule in self.ruleset.candidate_rules(action, literals):
             # TODO I wonder if we could have context matches return the found matches? for diectic references for the rule?
-            if test_rule.action == action and context_matches(test_rule.context, literals):
+            if context_matches(test_rule.context, literals):
                 rule = test_rule
                 if len(test_rule.outcomes.outcomes) > 1:
                     print("Rule had too many outcomes")
@@ -85,49 +148,27 @@ class SymbolicModel:
         effect = rule.outcomes.outcomes[0]
 
         atts = []
-        outcomes = []
 
         # Maps unique object name in the tree, to the real instance index in the environment
         name_instance_map = {v: k for k, v in instance_name_map.items()}
 
-        for reference, outcome in effect.value.items():
+        schema = self.env.get_schema()
+        by_reference, _ = literals.references()
+        for reference in effect.value.keys():
             # obb_att_str is formatted either `taxi.y` or `taxi-IN-key.state`. In general, `ob1-pred1-ob2-pred2...-obn`
-            from_ob = reference.from_ob
-            edge_type = reference.edge_type
-            class_name = reference.to_ob
-            att_name = reference.att_name
             # We handle the taxi case separately, as it isn't attached to anything
-            if edge_type is None:
+            if reference.edge_type is None:
                 unique_name = "taxi0"
             else:
-                # We have to find the correct match. A dictionary would be good for this
-                # Check for the match by looking for all of that object, and finding the one with the matching connection
-                test_id = 0
-                while True:
-                    test_name = class_name + str(test_id)
-                    node = literals.node_lookup[test_name]
-                    edge = node.to_edges[0]
-                    if from_ob == edge.from_node.object_name and edge_type == edge.type and class_name == edge.to_node.object_name:  # Check for a match
-                        break
-                    test_id += 1  # Try the next object of this type
-                # This the object that was being referenced
-                unique_name = class_name + str(test_id)
-
-            # Extract the name of the object class, and the identifier number
-            class_name, id_str = unique_name[:-1], unique_name[-1]
-            class_idx = self.env.OB_NAMES.index(class_name)
-            att_idx = self.env.ATT_NAMES[class_idx].index(att_name)
-            instance_id = name_instance_map[unique_name]
-
-            att_range = self.env.instance_index_map[instance_id]
-            att = att_range[0] + att_idx
-
-            atts.append(att)
-            outcomes.append(outcome)
+                # The lowest id object of that class with the matching connection
+                unique_name = by_reference[(reference.from_ob, reference.edge_type, reference.to_ob)]
+
+            # Extract the name of the object class, and find which attribute of which instance it is
+            atts.append(schema.attribute(unique_name[:-1], reference.att_name, name_instance_map[unique_name]))
 
         # Only create new effect if it isn't a JointNoEffect
         if len(atts) > 0:
-            effect = Outcome(atts, outcomes)
+            effect = schema.ground(effect, atts)
 
         transitions.append(Transition(effect, 1.0))
 
@@ -1,4 +1,5 @@
-from typing import List, Union, Tuple, Dict
+from collections import OrderedDict, deque
+from typing import List, Union, Tuple, Dict, Iterable
 import numpy as np
 import logging
 
@@ -7,6 +8,34 @@ from symbolic_stochastic_domains.predicate_tree import PredicateTree
 from symbolic_stochastic_domains.symbolic_classes import Outcome, DeicticReference
 
 
+class ObjectSchema:
+    """
+    Lookups for turning a deictic reference in an outcome into a state attribute index, built once per environment
+    instead of searching OB_NAMES and ATT_NAMES every time. The grounded outcomes get reused too, because the same rule
+    outcome keeps getting grounded to the same attributes
+    """
+    def __init__(self, env: "Environment"):
+        self.env = env
+
+        # Class name to its index in OB_NAMES, and (class index, attribute name) to the attribute's offset in an instance
+        self.class_index = {name: i for i, name in enumerate(env.OB_NAMES)}
+        self.att_index = {(i, att_name): j for i in range(len(env.OB_NAMES)) for j, att_name in enumerate(env.ATT_NAMES[i])}
+
+        self.grounded: Dict[tuple, Outcome] = dict()
+
+    def attribute(self, class_name: str, att_name: str, instance_id: int) -> int:
+        # The instance ranges are looked up each time, since generate_object_maps fills them in on the class
+        return self.env.instance_index_map[instance_id][0] + self.att_index[(self.class_index[class_name], att_name)]
+
+    def ground(self, outcome: Outcome, atts: List[int]) -> Outcome:
+        """The outcome with its references replaced by the attributes atts, in the same order"""
+        key = (outcome, tuple(atts))
+        if key not in self.grounded:
+            self.grounded[key] = Outcome(atts, list(outcome.value.values()))
+
+        return self.grounded[key]
+
+
 class Environment:
     """Base class for any environment the agent could be working in"""
     # From https://github.com/rail-cwru/hoomdp
@@ -33,6 +62,9 @@ class Environment:
 
     eval_states = []
 
+    # Most states get_literals keeps cached. Set to None for no limit
+    LITERALS_CACHE_SIZE = 50000
+
     curr_state: List[int] = None
     last_action: int = None
     last_reward: float = None
@@ -145,8 +177,89 @@ class Environment:
 
         self.instance_class_map = {i: c for i, c in enumerate(instance_classes)}
 
+    def get_schema(self) -> ObjectSchema:
+        """The lookups for grounding outcomes, made the first time they are needed"""
+        if self.__dict__.get("schema") is None:
+            self.schema = ObjectSchema(self)
+
+        return self.schema
+
+    def build_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
+        """Converts state to the literals from that state, and the map from object ids to names in the tree"""
+        raise NotImplementedError()
+
     def get_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
-        pass
+        """
+        Cached version of build_literals. The planners and models ask for the same states over and over,
+        and the state space is small, so each one only gets built once.
+        The tree is shared between callers and must not be modified
+        """
+        cache = self.get_literals_cache()
+        state = int(state)
+
+        if state in cache:
+            cache.move_to_end(state)
+            tree, ob_index_name_map = cache[state]
+        else:
+            tree, ob_index_name_map = self.build_literals(state)
+            cache[state] = (tree, ob_index_name_map)
+            if self.LITERALS_CACHE_SIZE is not None and len(cache) > self.LITERALS_CACHE_SIZE:
+                cache.popitem(last=False)
+
+        # The name map is small, give each caller their own
+        return tree, dict(ob_index_name_map)
+
+    def get_literals_cache(self) -> OrderedDict:
+        """
+        The per instance cache of flat state to literals. It is thrown out if the object name map changes,
+        because the names in the trees depend on it
+        """
+        object_name_map = getattr(self, "object_name_map", None)
+        if self.__dict__.get("literals_cache") is None or self.literals_cache_names != object_name_map:
+            self.literals_cache = OrderedDict()
+            self.literals_cache_names = dict(object_name_map) if object_name_map is not None else None
+
+        return self.literals_cache
+
+    def precompute_literals(self, states: Iterable[int] = None):
+        """
+        Fills the literal cache ahead of time. If no states are given, uses every state reachable from the current one.
+        Those are found by trying every action with the deterministic dynamics, then the env is put back how it was.
+        """
+        if states is None:
+            states = self.find_reachable_states()
+
+        for state in states:
+            self.get_literals(state)
+
+    def find_reachable_states(self) -> List[int]:
+        """Every state reachable from the current state, not going past the end of the episode. Doesn't use any randomness"""
+        saved = (self.curr_state, self.last_action, self.last_reward, self.stochastic)
+        self.stochastic = False
+
+        start = self.get_state()
+        seen = {start}
+        queue = deque([start])
+        try:
+            while len(queue) > 0:
+                state = queue.popleft()
+
+                # Nothing happens after the episode ends
+                self.curr_state = self.get_factored_state(state)
+                if self.end_of_episode():
+                    continue
+
+                for action in range(self.get_num_actions()):
+                    self.curr_state = self.get_factored_state(state)
+                    self.step(action)
+                    next_state = int(self.get_state())
+                    if next_state not in seen:
+                        seen.add(next_state)
+                        queue.append(next_state)
+        finally:
+            self.curr_state, self.last_action, self.last_reward, self.stochastic = saved
+
+        return list(seen)
 
     def get_observation_and_tree(self, next_state: List[int], correct_types: List[EffectType]) -> Tuple[PredicateTree, Outcome, dict]:
         # Get the correct effect type for each attribute. This is pretty good, but it would be better if it
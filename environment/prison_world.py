@@ -105,7 +105,7 @@ class Prison(Environment):
     #     # PredicateType.OPEN: [[OB_LOCK]]
     # }
 
-    def __init__(self, stochastic=True, shuffle_object_names=False, known_objects=None):
+    def __init__(self, stochastic=True, shuffle_object_names=False, known_objects=None, eager_literals=False):
         self.stochastic = stochastic
 
         # Add walls to the map
@@ -160,6 +160,10 @@ class Prison(Environment):
 
         self.restart()
 
+        # Build the literals for every reachable state now, instead of as they are needed
+        if eager_literals:
+            self.precompute_literals()
+
     def end_of_episode(self, state: int = None) -> bool:
         """Check if the episode has ended"""
         state = self.get_factored_state(state) if state else self.curr_state
@@ -222,7 +226,7 @@ class Prison(Environment):
 
         return ob_name
 
-    def get_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
+    def build_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
         """Converts state to the literals from that state using variables to refer to objects"""
 
         # Get object list from the current state
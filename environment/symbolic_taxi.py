@@ -79,7 +79,7 @@ class SymbolicTaxi(Environment):
              '| |   |   |',
              '| |   |   |']
 
-    def __init__(self, stochastic=True, shuffle_object_names=False, known_objects=None):
+    def __init__(self, stochastic=True, shuffle_object_names=False, known_objects=None, eager_literals=False):
         self.stochastic: bool = stochastic
 
         # Add walls to the map
@@ -116,6 +116,10 @@ class SymbolicTaxi(Environment):
         # Restart to begin episode
         self.restart()
 
+        # Build the literals for every reachable state now, instead of as they are needed
+        if eager_literals:
+            self.precompute_literals()
+
     def end_of_episode(self, state: int = None) -> bool:
         """Check if the episode has ended"""
         state = self.get_factored_state(state) if state else self.curr_state
@@ -160,7 +164,7 @@ class SymbolicTaxi(Environment):
 
         return objects
 
-    def get_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
+    def build_literals(self, state: int) -> Tuple[PredicateTree, Dict]:
         """Converts state to the literals from that state using variables to refer to objects"""
 
         # Get object list from the current state
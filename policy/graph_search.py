@@ -0,0 +1,63 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Breadth first search bookkeeping shared by the planners: the frontier, which states have been seen,
+and parent pointers to get the path back out. The planners decide what to expand and when to stop.
+"""
+
+from collections import deque
+from typing import List
+
+import numpy as np
+
+
+class BreadthFirstSearch:
+    """
+    The parent pointers are arrays over the flat state space. They are allocated once and reused between searches,
+    only resetting the states the last search touched, because the planners search many times per step
+    """
+    def __init__(self, num_states: int):
+        # For each state, the state it was reached from and the action that did it. -1 for the start state
+        self.parent_states = np.full(num_states, -1, dtype=np.int32)
+        self.parent_actions = np.full(num_states, -1, dtype=np.int8)
+
+        # Every state that has been added to the frontier (so, popped or still in it)
+        self.seen = set()
+        self.frontier = deque()
+
+    def start(self, state: int):
+        """Starts a new search from state"""
+        if len(self.seen) > 0:
+            touched = np.fromiter(self.seen, dtype=np.int64, count=len(self.seen))
+            self.parent_states[touched] = -1
+            self.parent_actions[touched] = -1
+
+        self.seen = {state}
+        self.frontier = deque([state])
+
+    def has_next(self) -> bool:
+        return len(self.frontier) > 0
+
+    def pop(self) -> int:
+        """The next state to expand"""
+        return self.frontier.popleft()
+
+    def is_new(self, state: int) -> bool:
+        """If the state hasn't been expanded yet and isn't already waiting to be"""
+        return state not in self.seen
+
+    def add(self, state: int, parent: int, action: int):
+        """Adds a new state to the frontier, reached by taking action in parent"""
+        self.seen.add(state)
+        self.parent_states[state] = parent
+        self.parent_actions[state] = action
+        self.frontier.append(state)
+
+    def get_path(self, state: int) -> List[int]:
+        """The actions to get from the start to state, in reverse order (so the next action is at the end)"""
+        path = []
+        while self.parent_states[state] != -1:
+            path.append(int(self.parent_actions[state]))
+            state = self.parent_states[state]
+
+        return path
@@ -0,0 +1,63 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Expected information gain of each (state, action) for the object transfer planners. The search asks for it on every
+action of every state it expands, but between belief changes it only depends on what the state's literals look like
+and the action, so each (signature, action) is only computed once per belief version.
+"""
+
+from typing import Iterable
+
+from symbolic_stochastic_domains.object_transfer import information_gain_of_action, estimate_information_gain_of_action
+from symbolic_stochastic_domains.prediction_cache import PredictionCache
+
+
+class InformationGainField:
+    """
+    With eager, every time the beliefs change all the distinct signatures get scored up front, so the search
+    is only lookups. Otherwise they are scored as the search gets to them.
+    With estimate, gains are sampled instead of trying every permutation, see estimate_information_gain_of_action
+    """
+    def __init__(self, model, num_actions: int, remove_duplicates=True, eager=False, estimate=False):
+        self.model = model
+        self.num_actions = num_actions
+        self.remove_duplicates = remove_duplicates
+        self.eager = eager
+        self.estimate = estimate
+
+        self.gains = PredictionCache()
+
+        # Belief version the eager pass was last done for
+        self.scored_version = None
+
+    def get(self, state: int, action: int, literals=None) -> float:
+        """Expected information gain of taking action in state. Pass literals for efficiency"""
+        if self.eager and self.scored_version != self.model.version:
+            self.score_all()
+
+        return self.lookup(state, action, literals)
+
+    def lookup(self, state: int, action: int, literals=None) -> float:
+        if literals is None:
+            literals, _ = self.model.env.get_literals(state)
+
+        information_gain = estimate_information_gain_of_action if self.estimate else information_gain_of_action
+        return self.gains.get(self.model.version, literals, action, lambda: information_gain(
+            self.model.env, state, action, self.model.object_map, self.model.previous_ruleset,
+            remove_duplicates=self.remove_duplicates, literals=literals
+        ))
+
+    def score_all(self, states: Iterable[int] = None):
+        """
+        Scores every action for every distinct signature in states, for the current beliefs.
+        If no states are given, uses every state the env has made literals for so far
+        """
+        self.scored_version = self.model.version
+
+        if states is None:
+            states = list(self.model.env.get_literals_cache().keys())
+
+        for state in states:
+            literals, _ = self.model.env.get_literals(state)
+            for action in range(self.num_actions):
+                self.lookup(state, action, literals)  # Repeated signatures are already cached, so this is cheap
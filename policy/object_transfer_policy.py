@@ -1,14 +1,15 @@
 import random
-from collections import deque
 
 from policy.policy import Policy
+from policy.graph_search import BreadthFirstSearch
+from policy.information_gain_field import InformationGainField
 
-from symbolic_stochastic_domains.object_transfer import information_gain_of_action
 from algorithm.symbolic_domains.object_transfer_model import ObjectTransferModel
 
 
 class ObjectTransferPolicy(Policy):
-    def __init__(self, actions: int, model: ObjectTransferModel):
+    def __init__(self, actions: int, model: ObjectTransferModel, eager_information_gain=False,
+                 estimate_information_gain=False):
         self.num_actions = actions
 
         self.model = model
@@ -16,7 +17,15 @@ class ObjectTransferPolicy(Policy):
         # Used to transfer information from the closest path to a new experience from the breadth first function
         self.path = []
 
-        self.last_object_map = {}
+        # Version of the model we last planned with, so we can replan whenever it changes
+        self.last_model_version = None
+
+        self.search = BreadthFirstSearch(model.env.get_num_states())
+
+        # Information gain of each action, kept until the object map changes
+        self.information_gain = InformationGainField(
+            model, actions, eager=eager_information_gain, estimate=estimate_information_gain
+        )
 
     def choose_action(self, curr_state: int, is_learning: bool = True) -> int:
         # For now, return random actions until we can figure out which object is which
@@ -30,9 +39,9 @@ class ObjectTransferPolicy(Policy):
 
         # If an object map change occured, we need to replan
         replan = False
-        if str(self.last_object_map) != str(self.model.object_map):
+        if self.last_model_version != self.model.version:
             print("Model changed, replanning")
-            self.last_object_map = self.model.object_map
+            self.last_model_version = self.model.version
             self.path = self.breadth_first_search_to_goal(curr_state)
             replan = True
 
@@ -69,23 +78,12 @@ class ObjectTransferPolicy(Policy):
         Uses breadth first search to find the sequence of actions to take
         to a state where it can gain information about which objects are which
         """
-        # List of visited states
-        visited = set()
-
-        # Queue to store in progress states
-        q = deque()
-
-        # Dictionary of state: [it's parent, the action that led to it]
-        parents = {}
-
         # Initialize search
-        q.append(state)
-        parents[state] = [-1, -1]
+        self.search.start(state)
 
         # print("Beginning breadth first search")
-        while len(q) != 0:
-            curr_state = q.popleft()
-            visited.add(curr_state)
+        while self.search.has_next():
+            curr_state = self.search.pop()
             literals, instance_name_map = self.model.env.get_literals(curr_state)
 
             # print(f"Popped state {curr_state}: {self.model.env.get_factored_state(curr_state)}")
@@ -94,8 +92,8 @@ class ObjectTransferPolicy(Policy):
             for action in range(self.num_actions):
                 # If we find an action with a positive info gain, then return the path to take that action
                 # Otherwise, generate next states
-                if information_gain_of_action(self.model.env, curr_state, action, self.model.object_map, self.model.previous_ruleset) > 0:
-                    path = self.get_path(curr_state, parents)
+                if self.information_gain.get(curr_state, action, literals=literals) > 0:
+                    path = self.search.get_path(curr_state)
                     path.insert(0, action)
                     return path
 
@@ -114,18 +112,16 @@ class ObjectTransferPolicy(Policy):
                 next_state = self.model.next_state(curr_state, effect)
 
                 # Don't add if we already saw this state or it is already in the queue
-                if next_state in visited or next_state in q:
+                if not self.search.is_new(next_state):
                     continue
 
-                # Update parents for this state. Need to do before otherwise it won't be in the list when we try
-                parents[next_state] = [curr_state, action]
+                # Update parents for this state and add it to the queue. Need to do before otherwise
+                # it won't be in the list when we try
+                self.search.add(next_state, curr_state, action)
 
                 # Found a goal state if the info gain from this state is positive
                 if self.model.get_reward(curr_state, next_state, action) > 0:
-                    return self.get_path(next_state, parents)  # Path to that state that gives us a reward
-
-                # Otherwise, add to queue
-                q.append(next_state)
+                    return self.search.get_path(next_state)  # Path to that state that gives us a reward
 
         # If we get down here, there is no path, so return empty
         return []
@@ -133,23 +129,12 @@ class ObjectTransferPolicy(Policy):
     def breadth_first_search_to_goal(self, state: int):
         """Uses breadth first search to find the goal using what it currently knows about transitions"""
 
-        # List of visited states
-        visited = set()
-
-        # Queue to store in progress states
-        q = deque()
-
-        # Dictionary of state: [it's parent, the action that led to it]
-        parents = {}
-
         # Initialize search
-        q.append(state)
-        parents[state] = [-1, -1]
+        self.search.start(state)
 
         # print("Beginning breadth first search")
-        while len(q) != 0:
-            curr_state = q.popleft()
-            visited.add(curr_state)
+        while self.search.has_next():
+            curr_state = self.search.pop()
             literals, instance_name_map = self.model.env.get_literals(curr_state)
 
             # print(f"Popped state {curr_state}: {self.model.env.get_factored_state(curr_state)}")
@@ -168,26 +153,16 @@ class ObjectTransferPolicy(Policy):
                 next_state = self.model.next_state(curr_state, effect)
 
                 # Don't add if we already saw this state or it is already in the queue
-                if next_state in visited or next_state in q:
+                if not self.search.is_new(next_state):
                     continue
 
-                # Update parents for this state. Need to do before otherwise it won't be in the list when we try
-                parents[next_state] = [curr_state, action]
+                # Update parents for this state and add it to the queue. Need to do before otherwise
+                # it won't be in the list when we try
+                self.search.add(next_state, curr_state, action)
 
                 # Found a goal state if reward is bigger than 0
                 if self.model.get_reward(curr_state, next_state, action) > 0:
-                    return self.get_path(next_state, parents)  # Path to that state that gives us a reward
-
-                # Otherwise, add to queue
-                q.append(next_state)
+                    return self.search.get_path(next_state)  # Path to that state that gives us a reward
 
         # If we get down here, there is no path, so return empty
         return []
-
-    def get_path(self, parent, parents):
-        path = []
-        while parents[parent][0] != -1:
-            path.append(parents[parent][1])
-            parent = parents[parent][0]
-
-        return path
@@ -5,16 +5,16 @@ Implements simplest explanation rule learning object transfer
 """
 
 import random
-from collections import deque
 
 from policy.policy import Policy
-from symbolic_stochastic_domains.object_transfer import information_gain_of_action
+from policy.graph_search import BreadthFirstSearch
+from policy.information_gain_field import InformationGainField
 from algorithm.symbolic_domains.simplest_explanation_model import SimplestExplanationModel
-from symbolic_stochastic_domains.experience_helper import ExperienceHelper
 
 
 class SimplestExplanationPolicy(Policy):
-    def __init__(self, actions: int, model: SimplestExplanationModel):
+    def __init__(self, actions: int, model: SimplestExplanationModel, eager_information_gain=False,
+                 estimate_information_gain=False):
         self.num_actions = actions
 
         self.model = model
@@ -24,6 +24,13 @@ class SimplestExplanationPolicy(Policy):
 
         self.last_object_map = {}
 
+        self.search = BreadthFirstSearch(model.env.get_num_states())
+
+        # Information gain of each action, kept until the beliefs change
+        self.information_gain = InformationGainField(
+            model, actions, remove_duplicates=False, eager=eager_information_gain, estimate=estimate_information_gain
+        )
+
         self.in_failure_speedup_mode_hack = False
 
         # Alternate paths if no reward can be found
@@ -89,26 +96,15 @@ class SimplestExplanationPolicy(Policy):
     def combined_search(self, state: int):
         """Simultaneously searches for a goal, info gain, and new experience"""
 
-        # List of visited states
-        visited = set()
-
-        # Queue to store in progress states
-        q = deque()
-
-        # Dictionary of state: [it's parent, the action that led to it]
-        parents = {}
-
         # Initialize search
-        q.append(state)
-        parents[state] = [-1, -1]
+        self.search.start(state)
 
         # print("Beginning breadth first search")
-        while len(q) != 0:
-            curr_state = q.popleft()
-            visited.add(curr_state)
+        while self.search.has_next():
+            curr_state = self.search.pop()
             literals, instance_name_map = self.model.env.get_literals(curr_state)
 
-            # print(f"Popped state {curr_state}, parent {parents[curr_state]}: {self.model.env.get_factored_state(curr_state)}")
+            # print(f"Popped state {curr_state}, parent {self.search.parent_states[curr_state]}: {self.model.env.get_factored_state(curr_state)}")
 
             # Generate all next states
             # I choose to do multiple small for loops rather than one big one, because I like how it organizes
@@ -144,27 +140,25 @@ class SimplestExplanationPolicy(Policy):
                 next_state = next_states[action]
 
                 # Add next states to the queue and update parents
-                if next_state == -1 or next_state in visited or next_state in q:
+                if next_state == -1 or not self.search.is_new(next_state):
                     continue
 
                 # Update parents for this state, and add to queue
-                parents[next_state] = [curr_state, action]
-                q.append(next_state)
+                self.search.add(next_state, curr_state, action)
 
             # Search for reward state, return if found
             for action in range(self.num_actions):
                 next_state = next_states[action]
                 if next_state != -1 and self.model.get_reward(curr_state, next_state, action) > 0:
-                    path = self.get_path(next_state, parents)
+                    path = self.search.get_path(next_state)
                     print("Found path to reward")
                     return path
 
             # Search for info gain if path not already found
             if len(self.path_to_information_gain) == 0:
                 for action in range(self.num_actions):
-                    if information_gain_of_action(self.model.env, curr_state, action, self.model.object_map,
-                                                  self.model.previous_ruleset, remove_duplicates=False) > 0:
-                        path = self.get_path(curr_state, parents)
+                    if self.information_gain.get(curr_state, action, literals=literals) > 0:
+                        path = self.search.get_path(curr_state)
                         path.insert(0, action)
                         print("Found path to information gain")
                         self.path_to_information_gain = path
@@ -172,38 +166,26 @@ class SimplestExplanationPolicy(Policy):
 
             # Search for new experiences. TODO Do not return if found, simply store in a path for later use
             if len(self.path_to_experience_1) == 0:
+                # Check if we haven't tried each action yet with the current combination of objects
+                novel_actions = self.model.new_experience_helper.novel_actions(literals, 1, self.num_actions)
                 for action in range(self.num_actions):
-                    # Check if we haven't tried this action yet with the current combination of objects
-                    experiences = self.model.new_experience_helper.experiences[0]  # Level 1 experience
-                    for experience in ExperienceHelper.extract_experiences(literals, n=1):
-                        if experience not in experiences or action not in experiences[experience]:
-                            print(f"Found an experience: {experience}, {action}")
-                            # TODO: currently it is taking the first it sees in the state
-                            path = self.get_path(curr_state, parents)
-                            path.insert(0, action)
-                            self.path_to_experience_1 = path
-                            break
+                    if novel_actions[action]:
+                        print(f"Found an experience: {action}")
+                        # TODO: currently it is taking the first it sees in the state
+                        path = self.search.get_path(curr_state)
+                        path.insert(0, action)
+                        self.path_to_experience_1 = path
 
             # Only if we couldn't find an experience 1
             if len(self.path_to_experience_1) == 0 and len(self.path_to_experience_2) == 0:
+                # Also record level 2 experiences. These will be tried if no state has a level 1 experience
+                novel_actions = self.model.new_experience_helper.novel_actions(literals, 2, self.num_actions)
                 for action in range(self.num_actions):
-                    # Also record level 2 experiences. These will be tried if no state has a level 1 experience
-                    experiences = self.model.new_experience_helper.experiences[1]  # Level 2 experience
-                    for experience in ExperienceHelper.extract_experiences(literals, n=2):
-                        if experience not in experiences or action not in experiences[experience]:
-                            print(f"Found an experience 2: {experience}, {action}")
-                            path = self.get_path(curr_state, parents)
-                            path.insert(0, action)
-                            self.path_to_experience_2 = path
-                            break
+                    if novel_actions[action]:
+                        print(f"Found an experience 2: {action}")
+                        path = self.search.get_path(curr_state)
+                        path.insert(0, action)
+                        self.path_to_experience_2 = path
 
         # If we get down here, there is no path, so return empty
         return []
-
-    def get_path(self, parent, parents):
-        path = []
-        while parents[parent][0] != -1:
-            path.append(parents[parent][1])
-            parent = parents[parent][0]
-
-        return path
@@ -1,7 +1,8 @@
 import random
-from collections import deque
 
 from policy.policy import Policy
+from policy.graph_search import BreadthFirstSearch
+from policy.transition_table import TransitionTable
 from algorithm.symbolic_domains.symbolic_model import SymbolicModel
 
 
@@ -20,20 +21,24 @@ class SymbolicPolicy(Policy):
         self.path_to_experience = []
         self.path_to_experience_2 = []
 
-        # Store previous ruleset so we can research whenever it changes
-        self.last_ruleset = None
+        # Store the version of the model we last planned with, so we can research whenever it changes
+        self.last_model_version = None
 
         # Unable to find a path to experience either
         self.unable_to_find = False
 
+        # Transitions under the current ruleset, kept between searches
+        self.transitions = TransitionTable(model, actions)
+        self.search = BreadthFirstSearch(model.env.get_num_states())
+
     def choose_action(self, curr_state: int, is_learning: bool = True) -> int:
         # Ok, here's the current plan. Use breadth first search to try and make it to the goal state
         # (state with the max reward). If we can't make it, take a random action.
 
         # If a rule change occured, we need to replan, also update unable_to_find
-        if str(self.last_ruleset) != str(self.model.ruleset):
+        if self.last_model_version != self.model.version:
             print("Model changed, replanning")
-            self.last_ruleset = self.model.ruleset
+            self.last_model_version = self.model.version
             self.path = self.breadth_first_search_to_goal(curr_state)
             self.unable_to_find = False
 
@@ -88,23 +93,15 @@ class SymbolicPolicy(Policy):
     def breadth_first_search_to_goal(self, state: int):
         """Uses breadth first search to find the goal using what it currently knows about transitions"""
 
-        # List of visited states
-        visited = set()
-
-        # Queue to store in progress states
-        q = deque()
-
-        # Dictionary of state: [it's parent, the action that led to it]
-        parents = {}
-
         # Initialize search
-        q.append(state)
-        parents[state] = [-1, -1]
+        self.search.start(state)
+
+        # Forget the transitions of any actions whose rules changed
+        self.transitions.update()
 
         # print("Beginning breadth first search")
-        while len(q) != 0:
-            curr_state = q.popleft()
-            visited.add(curr_state)
+        while self.search.has_next():
+            curr_state = self.search.pop()
             literals, instance_name_map = self.model.env.get_literals(curr_state)
 
             # print(f"Popped state {curr_state}: {self.model.env.get_factored_state(curr_state)}")
@@ -112,79 +109,59 @@ class SymbolicPolicy(Policy):
             # Generate all next states. Check if each is a new experience. Pick a new experience at random
             new_experiences = [False] * self.num_actions
             new_experiences_2 = [False] * self.num_actions
+
+            # Which actions haven't been tried yet with the combinations of objects in this state, for all actions at once
+            experience_helper = self.model.experience_helper
+            novel_actions = None
+            novel_actions_2 = None
+            if len(self.path_to_experience) == 0:
+                novel_actions = experience_helper.novel_actions(literals, 1, self.num_actions)  # Level 1 experience
+
             for action in range(self.num_actions):
                 # Check if we haven't tried this action yet with the current combination of objects
                 # We do this at the same time as searching for a goal to save processing power
-
-                if len(self.path_to_experience) == 0:
-                    experiences = self.model.experience_helper.experiences[0]  # Level 1 experience
-                    for experience in self.model.experience_helper.extract_experiences(literals, n=1):
-                        if experience not in experiences or action not in experiences[experience]:
-                            # print(f"Found an experience: {experience}, {action}")
-                            new_experiences[action] = True
-
-                            # This action is a new experience, we don't need to process the others.
-                            # Eventually, if one action gets more new experiences than others, take that first.
-                            break
+                if novel_actions is not None:
+                    new_experiences[action] = novel_actions[action]
 
                 # Also record level 2 experiences. These will be tried if no state has a level 1 experience
                 if len(self.path_to_experience_2) == 0 and not any(new_experiences):
-                    experiences = self.model.experience_helper.experiences[1]  # Level 2 experience
-                    for experience in self.model.experience_helper.extract_experiences(literals, n=2):
-                        if experience not in experiences or action not in experiences[experience]:
-                            # print(f"Found an experience 2: {experience}, {action}")
-                            new_experiences_2[action] = True
-
-                            # This action is a new experience, we don't need to process the others.
-                            # Eventually, if one action gets more new experiences than others, take that first.
-                            break
-
-                # Compute the next state, or don't do anything if we don't know. Pass literals for efficiency
-                transitions = self.model.compute_possible_transitions(
+                    if novel_actions_2 is None:
+                        novel_actions_2 = experience_helper.novel_actions(literals, 2, self.num_actions)
+                    new_experiences_2[action] = novel_actions_2[action]
+
+                # Look up the next state, or don't do anything if we don't know. Pass literals for efficiency
+                next_state, reward = self.transitions.lookup(
                     curr_state, action, literals=literals, instance_name_map=instance_name_map
                 )
 
-                if len(transitions) == 0:
+                if next_state is None:
                     # We don't know, skip
                     continue
 
-                effect = transitions[0].effect  # Assume only one effect, extract it from the transition
-                next_state = self.model.next_state(curr_state, effect)
-
                 # Don't add if we already saw this state or it is already in the queue
-                if next_state in visited or next_state in q:
+                if not self.search.is_new(next_state):
                     continue
 
-                # Update parents for this state. Need to do before otherwise it won't be in the list when we try
-                parents[next_state] = [curr_state, action]
+                # Update parents for this state and add it to the queue. Need to do before otherwise
+                # it won't be in the list when we try
+                self.search.add(next_state, curr_state, action)
 
                 # Found a goal state if reward is bigger than 0
-                if self.model.get_reward(curr_state, next_state, action) > 0:
-                    return self.get_path(next_state, parents)  # Path to that state that gives us a reward
-
-                # Otherwise, add to queue
-                q.append(next_state)
+                if reward > 0:
+                    return self.search.get_path(next_state)  # Path to that state that gives us a reward
 
             # After trying all actions, if none lead to a goal, pick a new experience at random
             if any(new_experiences):
                 new_experience_actions = [i for i, v in enumerate(new_experiences) if v]
-                path = self.get_path(curr_state, parents)
+                path = self.search.get_path(curr_state)
                 path.insert(0, random.choice(new_experience_actions))
                 self.path_to_experience = path
 
             if any(new_experiences_2):
                 new_experience_actions = [i for i, v in enumerate(new_experiences_2) if v]
-                path = self.get_path(curr_state, parents)
+                path = self.search.get_path(curr_state)
                 path.insert(0, random.choice(new_experience_actions))
                 self.path_to_experience_2 = path
 
         # If we get down here, there is no path, so return empty
         return []
-
-    def get_path(self, parent, parents):
-        path = []
-        while parents[parent][0] != -1:
-            path.append(parents[parent][1])
-            parent = parents[parent][0]
-
-        return path
@@ -0,0 +1,67 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Table of (state, action) -> (next state, reward) under a model's current ruleset, for the planners.
+Finding a transition means matching every rule against the state, applying the effect, and getting the reward,
+and breadth first search does that for every state it expands every time it replans. The transitions only
+depend on the rules for that action, so they are kept until one of those rules changes.
+"""
+
+from typing import Dict, List, Tuple, Optional
+
+
+class TransitionTable:
+    """
+    Filled in as states are expanded rather than for the whole flat state space, because that can be millions
+    of states (Prison) when the planner only ever reaches a few hundred of them.
+    """
+    def __init__(self, model, num_actions: int):
+        self.model = model
+        self.num_actions = num_actions
+
+        # For each action, state to (next state, reward). Next state is None if no rule says what happens
+        self.transitions: List[Dict[int, Tuple[Optional[int], float]]] = [dict() for _ in range(num_actions)]
+
+        # The rules the table for each action was made with, and the model version those came from
+        self.action_rules: List[Optional[List[str]]] = [None] * num_actions
+        self.model_version = None
+
+    def update(self):
+        """Throws out the transitions for any action whose rules have changed since last time"""
+        if self.model.version == self.model_version:
+            return
+
+        self.model_version = self.model.version
+
+        action_rules = [[] for _ in range(self.num_actions)]
+        for rule, rule_str in zip(self.model.ruleset.rules, self.model.ruleset.rules_key()):
+            if 0 <= rule.action < self.num_actions:  # Skip the default rule
+                action_rules[rule.action].append(rule_str)
+
+        for action in range(self.num_actions):
+            if action_rules[action] != self.action_rules[action]:
+                self.action_rules[action] = action_rules[action]
+                self.transitions[action] = dict()
+
+    def lookup(self, state: int, action: int, literals=None, instance_name_map=None) -> Tuple[Optional[int], float]:
+        """Returns the next state and reward for taking action in state, or None for the next state if unknown"""
+        transitions = self.transitions[action]
+        if state in transitions:
+            return transitions[state]
+
+        # Pass literals for efficiency
+        possible = self.model.compute_possible_transitions(
+            state, action, literals=literals, instance_name_map=instance_name_map
+        )
+
+        if len(possible) == 0:
+            transitions[state] = (None, 0.0)
+        else:
+            effect = possible[0].effect  # Assume only one effect, extract it from the transition
+            next_state = self.model.next_state(state, effect)
+            transitions[state] = (next_state, self.model.get_reward(state, next_state, action))
+
+        return transitions[state]
+
+    def __len__(self):
+        return sum(len(transitions) for transitions in self.transitions)
@@ -23,7 +23,7 @@ from policy.simplest_explanation_policy import SimplestExplanationPolicy
 
 
 class HeistSimplestExplanationRunner(Runner):
-    def __init__(self, exp_num, start_time):
+    def __init__(self, exp_num, start_time, num_workers=None):
         super().__init__()
 
         self.name = 'heist'
@@ -48,7 +48,7 @@ class HeistSimplestExplanationRunner(Runner):
 
         print(self.env.object_name_map)
 
-        self.model = SimplestExplanationModel(self.env, rules, examples, experience_helper)
+        self.model = SimplestExplanationModel(self.env, rules, examples, experience_helper, num_workers=num_workers)
         self.planner = SimplestExplanationPolicy(self.env.get_num_actions(), self.model)
         self.learner = SimplestExplanationLearner(self.env, self.model, self.planner, visualize=self.visualize, delay=10)
         self.data_recorder = DataRecorder(self, start_time)
@@ -61,6 +61,7 @@ def run_single_experiment(data: Tuple[int, str]):
     experiment_num, start_time = data
     runner = HeistSimplestExplanationRunner(experiment_num, start_time=start_time)
     runner.run_experiment(save_training=True)
+    runner.model.close()
 
 
 def main():
@@ -23,7 +23,7 @@ from policy.simplest_explanation_policy import SimplestExplanationPolicy
 
 
 class PrisonSimplestExplanationRunner(Runner):
-    def __init__(self, exp_num, start_time):
+    def __init__(self, exp_num, start_time, num_workers=None):
         super().__init__()
 
         self.name = 'prison'
@@ -48,7 +48,7 @@ class PrisonSimplestExplanationRunner(Runner):
 
         print(self.env.object_name_map)
 
-        self.model = SimplestExplanationModel(self.env, heist_rules, heist_examples, heist_experiences)
+        self.model = SimplestExplanationModel(self.env, heist_rules, heist_examples, heist_experiences, num_workers=num_workers)
         self.planner = SimplestExplanationPolicy(self.env.get_num_actions(), self.model)
         self.learner = SimplestExplanationLearner(self.env, self.model, self.planner, visualize=self.visualize, delay=10)
         self.data_recorder = DataRecorder(self, start_time)
@@ -67,6 +67,7 @@ def run_single_experiment(data: Tuple[int, str]):
 
     runner = PrisonSimplestExplanationRunner(experiment_num, start_time=start_time)
     runner.run_experiment(save_training=True)
+    runner.model.close()
 
     # profiler.disable()
     # stats = pstats.Stats(profiler)
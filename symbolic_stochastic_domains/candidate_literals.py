@@ -0,0 +1,130 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Candidate literals for the FOIL learner, stored as a delta (one literal to add to a context)
+instead of a full copy of the context. Almost all of the candidates are only ever scored, which can be done
+straight from the compiled bitmasks (see context_matcher.py), so the tree only gets copied for the one that's chosen.
+
+The list of literals for a context only depends on the context and which objects are in the examples,
+so they are kept in a bounded LRU cache keyed on those.
+"""
+
+from collections import OrderedDict
+from typing import List, Tuple, Iterable, Optional
+
+from symbolic_stochastic_domains.context_matcher import FEATURES, UNCOMPILABLE
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from symbolic_stochastic_domains.predicates_and_objects import PredicateType
+
+P_TYPES = [PredicateType.TOUCH_LEFT, PredicateType.TOUCH_RIGHT, PredicateType.TOUCH_DOWN,
+           PredicateType.TOUCH_UP, PredicateType.ON, PredicateType.IN]
+
+# Objects that can be open or not, so the learner also tries literals on that property
+OPENABLE_OBJECTS = ["lock", "pumzg"]
+
+# A literal is (predicate type, new node name, negative edge, open property value or None for no property)
+Literal = Tuple[PredicateType, str, bool, Optional[bool]]
+
+
+class CandidateLiteral:
+    """A context with one literal added to it, that hasn't been copied yet"""
+    __slots__ = ("context", "literal", "context_bits")
+
+    def __init__(self, context: PredicateTree, literal: Literal):
+        self.context = context
+        self.literal = literal
+        self.context_bits = None
+
+    def compile_context(self):
+        """The (required, forbidden) masks the context would have with the literal added, or UNCOMPILABLE"""
+        masks = self.context.context_bits if self.context.context_bits is not None else self.context.compile_context()
+        if masks is UNCOMPILABLE:
+            self.context_bits = UNCOMPILABLE
+            return self.context_bits
+
+        required, forbidden = masks
+        p_type, node_name, negative, open_value = self.literal
+        edge_key = (p_type, node_name[:-1])
+
+        # Same bits compile_context would use for the new edge and property
+        if negative:
+            forbidden |= FEATURES.bit(edge_key)
+        else:
+            required |= FEATURES.bit(edge_key)
+
+        if open_value is not None:
+            if open_value:
+                required |= FEATURES.bit(edge_key + (PredicateType.OPEN,))
+            else:
+                forbidden |= FEATURES.bit(edge_key + (PredicateType.OPEN,))
+
+        self.context_bits = (required, forbidden)
+        return self.context_bits
+
+    def to_context(self) -> PredicateTree:
+        """Copy the context and add the literal to it"""
+        p_type, node_name, negative, open_value = self.literal
+
+        tree = self.context.copy()
+        tree.add_node(node_name)
+        tree.add_edge("taxi0", node_name, p_type, negative=negative)
+        if open_value is not None:
+            tree.add_property(node_name, PredicateType.OPEN, open_value)
+
+        return tree
+
+
+def generate_literals(context: PredicateTree, object_names: Iterable[str]) -> List[Literal]:
+    """Every literal the learner could add to context, in the order the learner has always tried them"""
+    literals = []
+
+    for p_type in P_TYPES:
+        for object_name in object_names:
+            if not context.base_object.has_edge_with(p_type, object_name):
+                # Need a unique id for the new node
+                identifier = 0
+                while (object_name + str(identifier)) in context.node_lookup:
+                    identifier += 1
+                node_name = object_name + str(identifier)
+
+                # Need to test both positive and negative version of the literal
+                literals.append((p_type, node_name, False, None))
+                literals.append((p_type, node_name, True, None))
+
+                if object_name in OPENABLE_OBJECTS:
+                    literals.append((p_type, node_name, False, True))
+                    literals.append((p_type, node_name, False, False))
+
+    return literals
+
+
+class CandidateLiteralCache:
+    """Bounded LRU cache from (context string, object names) to the list of literals for that context"""
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.literals = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, context: PredicateTree, object_names: Iterable[str]) -> List[CandidateLiteral]:
+        # The object names are kept in iteration order because that decides the order of the literals
+        key = (str(context), tuple(object_names))
+
+        if key in self.literals:
+            self.hits += 1
+            self.literals.move_to_end(key)
+        else:
+            self.misses += 1
+            self.literals[key] = generate_literals(context, key[1])
+            if len(self.literals) > self.max_size:
+                self.literals.popitem(last=False)
+
+        return [CandidateLiteral(context, literal) for literal in self.literals[key]]
+
+    def clear(self):
+        self.literals.clear()
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self.literals)
@@ -0,0 +1,98 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Compiles predicate trees into integer bitmasks so checking if a rule context holds in a state
+is a couple of integer operations instead of walking the trees with Node.contains.
+
+Every feature a state can have gets its own bit:
+(edge type, object class) for each edge out of the taxi, (edge type, object class, property) for the
+properties of the object at the end of that edge, and (property) for properties of the taxi itself.
+A state compiles to the int of all the features it has. A context compiles to a required mask
+(positive edges and true properties) and a forbidden mask (negative edges and false properties).
+"""
+
+from typing import Tuple, Union
+
+
+class FeatureInterner:
+    """Maps feature keys to bit positions. Shared by every tree so the bits mean the same thing everywhere"""
+    def __init__(self):
+        self.bits = dict()
+
+    def bit(self, key) -> int:
+        if key not in self.bits:
+            self.bits[key] = 1 << len(self.bits)
+
+        return self.bits[key]
+
+
+FEATURES = FeatureInterner()
+
+# Returned when a tree can't be represented exactly with bits. Matching falls back to Node.contains
+UNCOMPILABLE = "uncompilable"
+
+
+def compile_state(tree) -> Union[int, str]:
+    """
+    Returns the feature int for a state, or UNCOMPILABLE if it can't be represented exactly.
+    That happens when two edges have the same type and object class but different properties,
+    because Node.contains is allowed to pick either one.
+    """
+    base = tree.base_object
+    features = 0
+
+    for key in base.properties:
+        features |= FEATURES.bit(("base", key))
+
+    edge_properties = dict()  # Edge bit to the property keys of the object at the end of it
+    for edge in base.edges:
+        edge_key = (edge.type, edge.to_node.object_name)
+        edge_bit = FEATURES.bit(edge_key)
+        properties = frozenset(edge.to_node.properties)
+
+        if edge_bit in edge_properties:
+            if edge_properties[edge_bit] != properties:
+                return UNCOMPILABLE
+            continue
+
+        edge_properties[edge_bit] = properties
+        features |= edge_bit
+        for key in properties:
+            features |= FEATURES.bit(edge_key + (key,))
+
+    return features
+
+
+def compile_context(tree) -> Union[Tuple[int, int], str]:
+    """
+    Returns the (required, forbidden) masks for a rule context, or UNCOMPILABLE if it can't be represented.
+    Contexts are only compiled if they are one level deep (taxi to objects), which is all the learner creates.
+    """
+    base = tree.base_object
+    required, forbidden = 0, 0
+
+    for key, value in base.properties.items():
+        if value:
+            required |= FEATURES.bit(("base", key))
+        else:
+            forbidden |= FEATURES.bit(("base", key))
+
+    for edge in base.edges:
+        node = edge.to_node
+        if len(node.edges) > 0 or len(node.negative_edges) > 0:
+            return UNCOMPILABLE
+
+        edge_key = (edge.type, node.object_name)
+        required |= FEATURES.bit(edge_key)
+
+        for key, value in node.properties.items():
+            if value:
+                required |= FEATURES.bit(edge_key + (key,))
+            else:
+                forbidden |= FEATURES.bit(edge_key + (key,))
+
+    # Negative edges don't care about properties, just if there is any edge of that type to that class
+    for edge in base.negative_edges:
+        forbidden |= FEATURES.bit((edge.type, edge.to_node.object_name))
+
+    return required, forbidden
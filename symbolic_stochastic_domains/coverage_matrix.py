@@ -0,0 +1,126 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Scores many candidate contexts against an example set at once for the FOIL learner.
+The example states are compiled (see context_matcher.py) into a boolean example x feature matrix one time,
+then the coverage of a whole batch of contexts is two matrix products instead of a context_matches per pair.
+"""
+
+from typing import List, Union
+
+import numpy as np
+
+from symbolic_stochastic_domains.context_matcher import UNCOMPILABLE
+from symbolic_stochastic_domains.candidate_literals import CandidateLiteral
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from symbolic_stochastic_domains.symbolic_classes import ExampleSet, Example
+from symbolic_stochastic_domains.symbolic_utils import context_matches
+
+
+def bits_to_matrix(all_bits: List[int], width: int) -> np.ndarray:
+    """Converts a list of feature ints into a boolean (len(all_bits), width) array, bit 0 first"""
+    matrix = np.zeros((len(all_bits), width), dtype=bool)
+
+    # Numpy can only shift 64 bit numbers, so do 64 features at a time
+    for start in range(0, width, 64):
+        size = min(64, width - start)
+        chunk = np.array([(bits >> start) & 0xFFFFFFFFFFFFFFFF for bits in all_bits], dtype=np.uint64)
+        matrix[:, start:start + size] = (chunk[:, None] >> np.arange(size, dtype=np.uint64)) & np.uint64(1)
+
+    return matrix
+
+
+class CoverageMatrix:
+    """Boolean example x feature matrix for an example set, with the example counts as weights"""
+    def __init__(self, examples: ExampleSet):
+        self.examples: List[Example] = list(examples.examples.keys())
+        self.row_lookup = {example: i for i, example in enumerate(self.examples)}
+        self.weights = np.array([examples.examples[example] for example in self.examples], dtype=np.int64)
+
+        # Compile every state. Any that can't be compiled get matched the slow way
+        features = []
+        self.fallback_rows = []
+        for i, example in enumerate(self.examples):
+            bits = example.state.state_bits if example.state.state_bits is not None else example.state.compile_state()
+            if bits is UNCOMPILABLE:
+                self.fallback_rows.append(i)
+                bits = 0
+            features.append(bits)
+
+        # Big enough for every feature any state has. Contexts can only add features no state has
+        self.width = max(1, max(bits.bit_length() for bits in features) if features else 1)
+        self.features = bits_to_matrix(features, self.width).astype(np.float32)
+
+    def rows(self, examples: List[Example]) -> np.ndarray:
+        """The row index of each example"""
+        return np.array([self.row_lookup[example] for example in examples], dtype=np.int64)
+
+    def coverage(self, contexts: List[Union[PredicateTree, CandidateLiteral]], rows: np.ndarray) -> np.ndarray:
+        """
+        Returns a boolean (len(rows), len(contexts)) array of which contexts match which examples.
+        Gives exactly the same answers as context_matches. Contexts can be trees or uncopied candidate literals
+        """
+        all_required, all_forbidden = [], []
+        never_matches = np.zeros(len(contexts), dtype=bool)
+        fallback_columns = []
+
+        for j, context in enumerate(contexts):
+            masks = context.context_bits if context.context_bits is not None else context.compile_context()
+            if masks is UNCOMPILABLE:
+                fallback_columns.append(j)
+                masks = (0, 0)
+
+            required_bits, forbidden_bits = masks
+
+            # Requiring a feature no state has means the context can't match anything.
+            # Forbidding one is always satisfied, so those bits can be dropped
+            if required_bits >> self.width:
+                never_matches[j] = True
+            all_required.append(required_bits)
+            all_forbidden.append(forbidden_bits)
+
+        required = bits_to_matrix(all_required, self.width).astype(np.float32)
+        forbidden = bits_to_matrix(all_forbidden, self.width).astype(np.float32)
+
+        features = self.features[rows]
+
+        # A context matches when none of its required features are missing, and none of its forbidden ones are present
+        missing = (1 - features) @ required.T
+        present = features @ forbidden.T
+        covered = (missing == 0) & (present == 0)
+        covered[:, never_matches] = False
+
+        # Anything that couldn't be compiled is checked one at a time. Candidate literals need a real tree for that
+        def as_tree(context):
+            return context.to_context() if isinstance(context, CandidateLiteral) else context
+
+        row_lookup = {row: i for i, row in enumerate(rows)}
+        fallback_rows = [row for row in self.fallback_rows if row in row_lookup]
+        if len(fallback_rows) > 0:
+            for j, context in enumerate(contexts):
+                tree = as_tree(context)
+                for row in fallback_rows:
+                    covered[row_lookup[row], j] = context_matches(tree, self.examples[row].state)
+
+        for j in fallback_columns:
+            tree = as_tree(contexts[j])
+            for i, row in enumerate(rows):
+                covered[i, j] = context_matches(tree, self.examples[row].state)
+
+        return covered
+
+    def weighted_coverage(self, contexts: List[Union[PredicateTree, CandidateLiteral]],
+                          *row_groups: np.ndarray) -> List[np.ndarray]:
+        """
+        For each group of rows, returns the total count of the examples in the group each context matches.
+        All the groups are computed in one batch
+        """
+        covered = self.coverage(contexts, np.concatenate(row_groups))
+
+        counts = []
+        start = 0
+        for rows in row_groups:
+            counts.append(self.weights[rows] @ covered[start:start + len(rows)])
+            start += len(rows)
+
+        return counts
@@ -6,7 +6,7 @@ Experiences are subsets of the literals graph combined with an action.
 I.E., have I ever been touching a lock while holding a key and used the unlock action?
 """
 
-from typing import List
+from typing import List, Dict
 import itertools
 
 from symbolic_stochastic_domains.predicate_tree import PredicateTree
@@ -18,6 +18,13 @@ class ExperienceHelper:
         # Each dictionary keeps track of experiences using n combinations of literals
         self.experiences = [{}, {}]
 
+        # Integer index of the experiences, so the planners can check for new experiences without the strings.
+        # For each n: experience string to id, state to the bitmask of the ids of its experiences,
+        # and action to the bitmask of the ids of the experiences that action has been tried with.
+        self.experience_ids: List[Dict[str, int]] = [{}, {}]
+        self.state_masks: List[Dict[PredicateTree, int]] = [{}, {}]
+        self.tried: List[Dict[int, int]] = [{}, {}]
+
     @staticmethod
     def extract_experiences(tree: PredicateTree, n: int) -> List[str]:
         """
@@ -68,9 +75,57 @@ class ExperienceHelper:
             else:
                 experiences[experience][action] += 1
 
+        tried = self.tried[n-1]
+        tried[action] = tried.get(action, 0) | self.experience_mask(literals, n)
+
+    def experience_mask(self, tree: PredicateTree, n: int) -> int:
+        """Bitmask of the ids of every experience of size n in the tree. Only computed once per state"""
+        masks = self.state_masks[n-1]
+        if tree not in masks:
+            ids = self.experience_ids[n-1]
+            mask = 0
+            for experience in ExperienceHelper.extract_experiences(tree, n):
+                if experience not in ids:
+                    ids[experience] = len(ids)
+                mask |= 1 << ids[experience]
+
+            masks[tree] = mask
+
+        return masks[tree]
+
+    def novel_actions(self, tree: PredicateTree, n: int, num_actions: int) -> List[bool]:
+        """
+        For each action, whether taking it in this state would be a new experience of size n.
+        Same as checking every experience in extract_experiences against the experience dict, for every action
+        """
+        mask = self.experience_mask(tree, n)
+        tried = self.tried[n-1]
+        return [mask & ~tried.get(action, 0) != 0 for action in range(num_actions)]
+
+    def build_index(self):
+        """Builds the integer index from the experience dicts"""
+        self.experience_ids = [{}, {}]
+        self.state_masks = [{}, {}]
+        self.tried = [{}, {}]
+
+        for experiences, ids, tried in zip(self.experiences, self.experience_ids, self.tried):
+            for experience, actions in experiences.items():
+                ids[experience] = len(ids)
+                for action in actions:
+                    tried[action] = tried.get(action, 0) | (1 << ids[experience])
+
     def copy(self):
         helper = ExperienceHelper()
         helper.experiences[0] = self.experiences[0].copy()
         helper.experiences[1] = self.experiences[1].copy()
+        helper.build_index()
 
         return helper
+
+    def __getstate__(self):
+        # The index can always be rebuilt, so only pickle the experiences
+        return {"experiences": self.experiences}
+
+    def __setstate__(self, state):
+        self.experiences = state["experiences"]
+        self.build_index()
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Tuple
 
 import numpy as np
 
@@ -6,61 +6,31 @@ from symbolic_stochastic_domains.predicate_tree import PredicateTree
 from symbolic_stochastic_domains.predicates_and_objects import PredicateType
 from symbolic_stochastic_domains.symbolic_classes import ExampleSet, RuleSet, Rule, OutcomeSet, Outcome, Example
 from symbolic_stochastic_domains.symbolic_utils import context_matches, applicable
+from symbolic_stochastic_domains.coverage_matrix import CoverageMatrix
+from symbolic_stochastic_domains.candidate_literals import CandidateLiteral, CandidateLiteralCache
 
-# Mapping from level to possible contexts, so we don't have to regenerate them each time
-# What is the memory usage of this?
-NEW_CONTEXTS = dict()  # Disable it for now
+# Candidate literals for each context, so we don't have to regenerate them each time. Shared by every learner
+CANDIDATE_LITERALS = CandidateLiteralCache(max_size=10000)
 
 
 class RulesetLearner:
     def __init__(self):
-        self.object_names = set()  # List of objects referred to in exampels
-
-    def create_new_contexts_from_context(self, context: PredicateTree) -> List[PredicateTree]:
-        new_contexts = []
-
-        p_types = [PredicateType.TOUCH_LEFT, PredicateType.TOUCH_RIGHT, PredicateType.TOUCH_DOWN,
-                   PredicateType.TOUCH_UP, PredicateType.ON, PredicateType.IN]
+        self.object_names = []  # List of objects referred to in exampels, sorted
+        self.literal_cache = CANDIDATE_LITERALS
 
+    def candidate_literals(self, context: PredicateTree) -> List[CandidateLiteral]:
+        """
+        Every literal that could be added to context. These aren't copied into new trees, call to_context()
+        on the one you want to keep
+        """
         # Get the list of objects in the environment from the env. Modify it: no taxi, add wall
         # This is because we need a list of all objects the taxi can interact with
         # My new learning method uses the previous objects names when finding literals
         # So now which names we use depends on this
-        object_names = self.object_names
-
-        for p_type in p_types:
-            for object_name in object_names:
-                if not context.base_object.has_edge_with(p_type, object_name):
-                    copy1 = context.copy()
-                    copy2 = context.copy()
-
-                    # Need to test both positive and negative version of the literal
-                    # TODO: Should the tree handle the node ids? Or can they all be 0? No, because there is on key and in key
-                    # Thus, the tree should handle the node ids. FOr now lets try making them all 0?
-                    # Weird hack to get the correct unique id to work. Probably could store this somewhere
-                    identifier = 0
-                    while (object_name + str(identifier)) in context.node_lookup:
-                        identifier += 1
-                    copy1.add_node(object_name + str(identifier))
-                    copy1.add_edge("taxi0", object_name + str(identifier), p_type)
-                    copy2.add_node(object_name + str(identifier))
-                    copy2.add_edge("taxi0", object_name + str(identifier), p_type, negative=True)
-
-                    new_contexts.append(copy1)
-                    new_contexts.append(copy2)
-
-                    # TODO It's because I'm not adding properties??
-                    if object_name == "lock" or object_name == "pumzg":
-                        copy3 = copy1.copy()
-                        copy4 = copy1.copy()
-
-                        copy3.add_property(object_name + str(identifier), PredicateType.OPEN, True)
-                        copy4.add_property(object_name + str(identifier), PredicateType.OPEN, False)
-
-                        new_contexts.append(copy3)
-                        new_contexts.append(copy4)
-
-        return new_contexts
+        return self.literal_cache.get(context, self.object_names)
+
+    def create_new_contexts_from_context(self, context: PredicateTree) -> List[PredicateTree]:
+        return [candidate.to_context() for candidate in self.candidate_literals(context)]
 
     def initialize_deictic_rules(self, outcome: Outcome) -> List[PredicateTree]:
         """
@@ -98,12 +68,18 @@ class RulesetLearner:
 
         return contexts
 
-    def find_rule_by_first_order_inductive_logic(self, examples: ExampleSet, relevant_examples: List[Example], irrelevant_examples: List[Example]):
+    def find_rule_by_first_order_inductive_logic(self, examples: ExampleSet, relevant_examples: List[Example],
+                                                 irrelevant_examples: List[Example], coverage: CoverageMatrix = None):
         # See https://www.geeksforgeeks.org/first-order-inductive-learner-foil-algorithm/
         # relevant_examples is our positive examples
         # irrelevant_examples is our negative examples
         # Both of these lists are constrained to examples that match the action
 
+        if coverage is None:
+            coverage = CoverageMatrix(examples)
+        relevant_rows = coverage.rows(relevant_examples)
+        irrelevant_rows = coverage.rows(irrelevant_examples)
+
         # This information is static throughout the learning process
         action = relevant_examples[0].action
         outcomes = OutcomeSet()
@@ -131,50 +107,27 @@ class RulesetLearner:
             # L is the candidate literal to add to rule R. p0 = number of positive bindings of R
             # n0 = number of negative bindings of R. p1 = number of positive binding of R + L
             # n1 = number of negative bindings of R + L. t  = number of positive bindings of R also covered by R + L
-            p0 = sum([examples.examples[ex] for ex in relevant_examples if context_matches(rule.context, ex.state)])
-            n0 = sum([examples.examples[ex] for ex in irrelevant_examples if context_matches(rule.context, ex.state)])
-
-            # TODO: Store best in a list, or store top N in a heap, instead of storing all then sorting
-
-            scores = []
-            for context in new_contexts:
-                # Find p1 and n1
-                p1 = sum([examples.examples[ex] for ex in relevant_examples if context_matches(context, ex.state)])
-                n1 = sum([examples.examples[ex] for ex in irrelevant_examples if context_matches(context, ex.state)])
-
-                # t = number of positive bindings of R also covered by R + L.
-                # t = sum([examples.examples[ex] for ex in relevant_examples if (context_matches(context, ex.state) and context_matches(rule.context, ex.state))])
-                # I think this is always true, rule.context will match ex.state, that's why ex is in relevant examples
-                # But I'm not sure about this, the examples are only there because the outcome matches
-                # assert t == p1, f"{p1}, {n1}, {t}"  # A check to make sure
-                t = p1
-
-                if p1 != 0:  # If the new rule covers no examples that leads to invalid value in log2
-                    gain = t * (np.log2(p1 / (p1 + n1)) - np.log2(p0 / (p0 + n0)))
-                else:
-                    gain = -10
-                # print(f"{context}, {p0}, {n0}, {p1}, {n1}, {t} {gain:.4f}")
-
-                scores.append(gain)
-
-            idxs = np.argsort(scores)
-            scores = [scores[i] for i in idxs]
-            new_contexts = [new_contexts[i] for i in idxs]
-
-            # print()
-            # for score, context in zip(scores[-3:], new_contexts[-3:]):
-            #     print(f"{context}: {score:.4f}")
-
-            # Extract the best score to look for ties
-            best_score = scores[-1]
-            best_contexts = []
-            i = len(scores) - 1
-            while scores[i] == best_score and i >= 0:
-                best_contexts.append(new_contexts[i])
-                i -= 1
-
-            # In case of ties, find one that matches diectic references. Start with end of the list just in case
-            best_context = new_contexts[-1]
+            # All the counts come from the coverage matrix, for the rule and every candidate at once
+            positives, negatives = coverage.weighted_coverage([rule.context] + new_contexts, relevant_rows, irrelevant_rows)
+            p0, p1 = positives[0], positives[1:]
+            n0, n1 = negatives[0], negatives[1:]
+
+            # t = number of positive bindings of R also covered by R + L.
+            # I think this is always p1, rule.context will match ex.state, that's why ex is in relevant examples
+            # But I'm not sure about this, the examples are only there because the outcome matches
+            t = p1
+
+            # If the new rule covers no examples that leads to an invalid value in log2, so give it a gain of -10 instead
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.where(p1 != 0, t * (np.log2(p1 / (p1 + n1)) - np.log2(p0 / (p0 + n0))), -10)
+
+            # Take the best. Ties are broken the same way sorting them always did, so the learned rules don't change
+            best = np.argmax(scores)
+            if np.count_nonzero(scores == scores[best]) > 1:
+                best = np.argsort(scores)[-1]
+            best_context = new_contexts[best]
+            if isinstance(best_context, CandidateLiteral):
+                best_context = best_context.to_context()
 
             # print("Chose best context:")
             # print(best_context)
@@ -187,7 +140,7 @@ class RulesetLearner:
 
             # If not done, add more candidate literals to the rule
             if len(new_rule_negatives) > 0:
-                new_contexts = self.create_new_contexts_from_context(rule.context)
+                new_contexts = self.candidate_literals(rule.context)
 
             # print("New rule negatives:")
             # for ex in new_rule_negatives:
@@ -199,11 +152,16 @@ class RulesetLearner:
 
         return rule
 
-    def learn_minimal_ruleset_for_outcome(self, examples: ExampleSet, outcome: Outcome) -> List[Rule]:
+    def learn_minimal_ruleset_for_outcome(self, examples: ExampleSet, outcome: Outcome,
+                                          coverage: CoverageMatrix = None) -> List[Rule]:
         """
         The goal is to explain every example in examples that has outcome of outcome,
-        without overlapping any other examples
+        without overlapping any other examples.
+        Pass in a coverage matrix of examples if learning many outcomes, so it only has to be built once
         """
+        if coverage is None:
+            coverage = CoverageMatrix(examples)
+
         # print(f"Learning rules for outcome {outcome}")
         rules = []
 
@@ -225,7 +183,7 @@ class RulesetLearner:
             # rules.append(best_rule)
 
             # For rules, can have decitic reference checks combining tree and outcome.
-            best_rule = self.find_rule_by_first_order_inductive_logic(examples, relevant_examples, irrelevant_examples)
+            best_rule = self.find_rule_by_first_order_inductive_logic(examples, relevant_examples, irrelevant_examples, coverage)
             rules.append(best_rule)
 
             # Update relevant examples by removing ones the new rule didn't apply to, add those ones to irrelevant examples
@@ -246,6 +204,20 @@ class RulesetLearner:
 
         return rules
 
+    def find_unique_outcomes(self, examples: ExampleSet) -> List[Outcome]:
+        """Returns every unique outcome in the examples, in the order they were first experienced"""
+        unique_outcomes = []
+
+        # Find all the unique outcomes that have been experienced. Exclude JointNoEffect, we will assume
+        # anything not covered by the other rules leads to no effect
+        for example in examples.examples.keys():
+            if example.outcome in unique_outcomes or example.outcome.is_no_effect():
+                continue
+
+            unique_outcomes.append(example.outcome)
+
+        return unique_outcomes
+
     def learn_ruleset(self, examples: ExampleSet) -> RuleSet:
         """
         Given a set of training examples, learns the optimal ruleset to explain them
@@ -257,24 +229,17 @@ class RulesetLearner:
         # Ruleset for an example form a if (A ^ B) v (~C) v (D) structure where the rules are or'd.
 
         # First, get a list of every unique outcome
-        unique_outcomes = []
-
-        # Find all the unique outcomes that have been experienced. Exclude JointNoEffect, we will assume
-        # anything not covered by the other rules leads to no effect
-        for example in examples.examples.keys():
-            if example.outcome in unique_outcomes or example.outcome.is_no_effect():
-                continue
-
-            unique_outcomes.append(example.outcome)
+        unique_outcomes = self.find_unique_outcomes(examples)
 
         # print("Unique outcomes:")
         # print(unique_outcomes)
         # unique_outcomes = [unique_outcomes[4]]  # test learning issues
 
-        # Learn the rules for each outcome
+        # Learn the rules for each outcome. Every outcome is scored against the same examples
+        coverage = CoverageMatrix(examples)
         rules = []
         for outcome in unique_outcomes:
-            new_rules = self.learn_minimal_ruleset_for_outcome(examples, outcome)
+            new_rules = self.learn_minimal_ruleset_for_outcome(examples, outcome, coverage)
             rules.extend(new_rules)
 
         # print()
@@ -283,3 +248,50 @@ class RulesetLearner:
         #     print(rule)
 
         return RuleSet(rules)
+
+    def learn_ruleset_delta(self, previous_ruleset: RuleSet, previous_examples: ExampleSet, examples: ExampleSet,
+                            changed: List[Example]) -> Tuple[RuleSet, int]:
+        """
+        Same as learn_ruleset(examples), when previous_ruleset was learned from previous_examples and examples is them
+        with the changed examples added or removed. An outcome's rules only depend on its relevant examples (the ones
+        with that outcome) and irrelevant ones (same action, other outcome), so only outcomes where those changed are
+        relearned, the rest of the rules are reused. Also returns how many nodes the rules grew by.
+        If the objects in the examples changed, the candidate literals are different, so everything is relearned
+        """
+        previous_size = sum(len(rule.context.nodes) for rule in previous_ruleset.rules)
+
+        self.object_names = examples.referenced_object_names()
+        if self.object_names != previous_examples.referenced_object_names():
+            ruleset = self.learn_ruleset(examples)
+            return ruleset, sum(len(rule.context.nodes) for rule in ruleset.rules) - previous_size
+
+        ruleset = self.relearn_outcomes(previous_ruleset, examples, changed)
+        return ruleset, sum(len(rule.context.nodes) for rule in ruleset.rules) - previous_size
+
+    def relearn_outcomes(self, previous_ruleset: RuleSet, examples: ExampleSet, changed: List[Example]) -> RuleSet:
+        """
+        The part of learn_ruleset_delta after checking the objects didn't change: relearns the rules for the outcomes
+        of the changed examples and the other outcomes of their actions, and reuses the rest from previous_ruleset
+        """
+        # The learner takes the action from the first example with the outcome
+        unique_outcomes = self.find_unique_outcomes(examples)
+        actions = []
+        for outcome in unique_outcomes:
+            actions.append(next(ex.action for ex in examples.examples.keys() if ex.outcome == outcome))
+
+        coverage = None
+        rules = []
+        for outcome, action in zip(unique_outcomes, actions):
+            # Rules without an outcome (like SymbolicModel's default rule) aren't for any of them
+            previous_rules = [rule for rule in previous_ruleset.rules
+                              if len(rule.outcomes.outcomes) > 0 and rule.outcomes.outcomes[0] == outcome]
+            if len(previous_rules) > 0 and not any(ex.outcome == outcome or ex.action == action for ex in changed):
+                rules.extend(previous_rules)
+                continue
+
+            # Only build this if something needs learning
+            if coverage is None:
+                coverage = CoverageMatrix(examples)
+            rules.extend(self.learn_minimal_ruleset_for_outcome(examples, outcome, coverage))
+
+        return RuleSet(rules)
@@ -0,0 +1,150 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Keeps the object map belief (which known objects each unknown object could still be) as constraint propagation.
+Each unknown's possibilities are a bitmask over the known object names, and each ObjectAssignmentList from
+an example is a constraint that is remembered. When possibilities change, only the constraints that mention
+those unknowns get looked at again, instead of rerunning determine_possible_object_maps over the whole history.
+The rules for what a constraint tells us are the same as in determine_possible_object_maps.
+"""
+
+from collections import deque
+from typing import Dict, List, Iterable
+
+from symbolic_stochastic_domains.object_transfer import ObjectAssignmentList
+
+
+class ObjectMapConstraints:
+    def __init__(self, object_map: Dict[str, List[str]], known_names: List[str]):
+        # Bit for each known name. Lists are made in this order, which is the order the object map lists started in
+        self.known_names = list(known_names)
+        self.bits = {name: 1 << i for i, name in enumerate(self.known_names)}
+
+        self.domains = {unknown: self.to_mask(knowns) for unknown, knowns in object_map.items()}
+
+        # Every constraint added so far, and for each unknown, the indices of the constraints that mention it
+        self.constraints: List[ObjectAssignmentList] = []
+        self.watchers = {unknown: [] for unknown in self.domains}
+
+        # Anything already down to one option can't be anything else
+        self.propagate(deque(), [unknown for unknown, domain in self.domains.items() if self.is_single(domain)])
+
+    def to_mask(self, knowns: Iterable[str]) -> int:
+        mask = 0
+        for known in knowns:
+            mask |= self.bits.get(known, 0)
+        return mask
+
+    @staticmethod
+    def is_single(mask: int) -> bool:
+        return mask != 0 and mask & (mask - 1) == 0
+
+    def object_map(self) -> Dict[str, List[str]]:
+        """The current belief as the usual dict of lists"""
+        return {unknown: [name for name in self.known_names if domain & self.bits[name]]
+                for unknown, domain in self.domains.items()}
+
+    def add_constraints(self, assignment_lists: Iterable[ObjectAssignmentList]) -> bool:
+        """Adds new constraints and propagates them. Returns if any possibilities changed"""
+        queue = deque()
+        for assignment_list in assignment_lists:
+            index = len(self.constraints)
+            self.constraints.append(assignment_list)
+
+            unknowns = set()
+            for assignment in assignment_list.assignments:
+                unknowns.update(assignment.positives.keys())
+                unknowns.update(assignment.negatives.keys())
+
+            for unknown in unknowns:
+                self.watchers[unknown].append(index)
+
+            queue.append(index)
+
+        return self.propagate(queue, [])
+
+    def propagate(self, queue: deque, singles: List[str]) -> bool:
+        """
+        Applies constraints in the queue until nothing changes. Whenever an unknown's possibilities change,
+        every constraint watching it is queued again, and if it is down to one, that is removed from the others
+        """
+        queued = set(queue)
+        any_changed = False
+
+        while len(queue) > 0 or len(singles) > 0:
+            if len(queue) > 0:
+                index = queue.popleft()
+                queued.discard(index)
+                changed = self.apply(self.constraints[index])
+            else:
+                # Remove an object that has been brought to one from the others
+                unknown = singles.pop()
+                changed = []
+                for unknown2, domain2 in self.domains.items():
+                    if unknown2 != unknown and domain2 & self.domains[unknown]:
+                        self.domains[unknown2] = domain2 & ~self.domains[unknown]
+                        changed.append(unknown2)
+
+            for unknown in changed:
+                any_changed = True
+                assert self.domains[unknown] != 0, f"Should always have a belief about what objects it is: {unknown}"
+
+                if self.is_single(self.domains[unknown]):
+                    singles.append(unknown)
+
+                for index in self.watchers[unknown]:
+                    if index not in queued:
+                        queued.add(index)
+                        queue.append(index)
+
+        return any_changed
+
+    def apply(self, assignment_list: ObjectAssignmentList) -> List[str]:
+        """Narrows down possibilities using one constraint. Returns which unknowns changed"""
+        domains = self.domains
+
+        # Pick out only the assignments that aren't definitely false
+        not_false_assignments = []
+        for assignment in assignment_list.assignments:
+            has_positives = len(assignment.positives) > 0
+            assert not (has_positives and len(assignment.negatives) > 0), "Should never have both, I think"
+
+            if has_positives:
+                is_false = any(not domains[unknown] & self.bits.get(known, 0)
+                               for unknown, known in assignment.positives.items())
+            else:
+                is_false = any(domains[unknown] == self.bits.get(known, 0)
+                               for unknown, knowns in assignment.negatives.items() for known in knowns)
+
+            if not is_false:
+                not_false_assignments.append(assignment)
+
+        new_domains = dict()
+
+        # If the length is one, then we know that one must be true, so we can apply it
+        if len(not_false_assignments) == 1:
+            assignment = not_false_assignments[0]
+            for unknown, known in assignment.positives.items():
+                new_domains[unknown] = self.bits[known]
+
+            for unknown, knowns in assignment.negatives.items():
+                new_domains[unknown] = new_domains.get(unknown, domains[unknown]) & ~self.to_mask(knowns)
+
+        # If there are more, the positives say it could be any of them. Negatives could be the reason, so skip
+        elif len(not_false_assignments) > 1:
+            if not any(len(assignment.negatives) > 0 for assignment in not_false_assignments):
+                possibilities = dict()
+                for assignment in not_false_assignments:
+                    for unknown, known in assignment.positives.items():
+                        possibilities[unknown] = possibilities.get(unknown, 0) | self.bits[known]
+
+                for unknown, mask in possibilities.items():
+                    new_domains[unknown] = domains[unknown] & mask
+
+        changed = []
+        for unknown, domain in new_domains.items():
+            if domain != domains[unknown]:
+                domains[unknown] = domain
+                changed.append(unknown)
+
+        return changed
@@ -0,0 +1,195 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Enumerates the possible assignments of unknown objects in a state to known object names, given an object map,
+for checking which of an action's rules apply under each assignment.
+
+Only the objects the rules actually look at are permuted. Node.contains only ever compares the name of an
+object at the end of an edge whose type is in the rule context, so everything else can be anything
+and the rules still give the same answer. Those objects are just counted, so the permutations each relevant
+assignment stands for can still be weighted correctly. Rules are checked against the original tree with the
+names looked up in the mapping, instead of making a renamed copy of the tree for every permutation.
+"""
+
+from typing import Dict, Iterator, List, Set, Tuple, Optional
+import random
+
+
+def find_relevant_objects(state_node, context_nodes: list, relevant: Set[str]):
+    """
+    Adds the names of every object below state_node that matching against any of context_nodes would compare.
+    An over approximation, because it follows edges by type without checking that the names match.
+    """
+    for edge2 in state_node.edges:
+        compared = False
+        children = []  # Context nodes that this edge's object would be matched against next
+        for context_node in context_nodes:
+            for edge in context_node.edges:
+                if edge.type == edge2.type:
+                    compared = True
+                    children.append(edge.to_node)
+
+            for edge in context_node.negative_edges:
+                if edge.type == edge2.type:
+                    compared = True
+
+        if compared:
+            relevant.add(edge2.to_node.object_name)
+            if len(children) > 0:
+                find_relevant_objects(edge2.to_node, children, relevant)
+
+
+def mapped_contains(state_node, context_node, mapping: Dict[str, str]) -> bool:
+    """
+    Node.contains, but as if every node in the state tree was renamed with mapping.
+    All the names it compares are relevant objects, so mapping only needs those
+    """
+    for edge in context_node.edges:  # For every edge, we need to find a matching edge
+        found = False
+        for edge2 in state_node.edges:
+            if (
+                edge.type == edge2.type and
+                edge.to_node.object_name == mapping[edge2.to_node.object_name] and
+                mapped_contains(edge2.to_node, edge.to_node, mapping)
+            ):
+                found = True
+                break
+
+        if not found:
+            return False
+
+    # Verify there are no negative edge matches
+    for negative_edge in context_node.negative_edges:
+        for edge in state_node.edges:
+            if negative_edge.type == edge.type and negative_edge.to_node.object_name == mapping[edge.to_node.object_name]:
+                return False
+
+    # Make sure it has all positive properties and no negative properties
+    for key, value in context_node.properties.items():
+        if value and key not in state_node.properties:
+            return False
+
+        if not value and key in state_node.properties:
+            return False
+
+    return True
+
+
+class ObjectPermutations:
+    """
+    The assignments of the objects in literals to what the object map believes they could be, as far as rules
+    can tell them apart. Each relevant assignment comes with how many full permutations of the state objects
+    it stands for (the same permutations itertools.product over the object map would give, minus duplicates).
+    """
+    def __init__(self, literals, object_map: Dict[str, List[str]], rules: list, remove_duplicates=True):
+        self.literals = literals
+        self.object_map = object_map
+        self.rules = rules
+        self.remove_duplicates = remove_duplicates
+
+        # Objects that are currently in the state. Sorted so the order doesn't depend on the hash seed
+        state_objects = sorted(set(diectic_obj.split("-")[-1] for diectic_obj in literals.referenced_objects))
+
+        relevant = set()
+        find_relevant_objects(literals.base_object, [rule.context.base_object for rule in rules], relevant)
+
+        self.relevant_objects = [name for name in state_objects if name in relevant]
+        self.irrelevant_objects = [name for name in state_objects if name not in relevant]
+
+        # Number of ways to fill in the irrelevant objects, by (where we are in the list, which names are used up)
+        self.completions = dict()
+
+        # Number of permutations left, by (where we are in the relevant objects, which names are used up)
+        self.assignment_counts = dict()
+
+    def assignments(self) -> Iterator[Tuple[Dict[str, str], int]]:
+        """Yields (mapping of relevant objects, number of permutations it stands for), skipping any with 0"""
+        mapping = {"taxi": "taxi"}  # Taxi has to be there but always maps to itself
+        yield from self.assign(0, mapping, set())
+
+    def assign(self, i: int, mapping: Dict[str, str], used: Set[str]):
+        if i == len(self.relevant_objects):
+            count = self.count_completions(frozenset(used))
+            if count > 0:
+                yield mapping.copy(), count
+            return
+
+        unknown = self.relevant_objects[i]
+        for known in self.object_map[unknown]:
+            # Two objects can not be mapped to the same thing, so don't even generate those
+            if self.remove_duplicates and known in used:
+                continue
+
+            mapping[unknown] = known
+            used.add(known)
+            yield from self.assign(i + 1, mapping, used)
+            used.discard(known)
+
+        mapping.pop(unknown, None)
+
+    def count_completions(self, used: frozenset, i: int = 0) -> int:
+        """How many ways the irrelevant objects from i on can be assigned, without reusing any names in used"""
+        if not self.remove_duplicates:
+            count = 1
+            for unknown in self.irrelevant_objects[i:]:
+                count *= len(self.object_map[unknown])
+            return count
+
+        if i == len(self.irrelevant_objects):
+            return 1
+
+        if (i, used) not in self.completions:
+            self.completions[(i, used)] = sum(self.count_completions(used | {known}, i + 1)
+                                              for known in self.object_map[self.irrelevant_objects[i]]
+                                              if known not in used)
+
+        return self.completions[(i, used)]
+
+    def size(self) -> int:
+        """Number of permutations before throwing out duplicates, so an upper bound on how many there are"""
+        size = 1
+        for unknown in self.relevant_objects + self.irrelevant_objects:
+            size *= len(self.object_map[unknown])
+        return size
+
+    def count_assignments(self, i: int, used: frozenset) -> int:
+        """How many permutations there are once the relevant objects before i have been given the names in used"""
+        if i == len(self.relevant_objects):
+            return self.count_completions(used)
+
+        if (i, used) not in self.assignment_counts:
+            self.assignment_counts[(i, used)] = sum(self.count_assignments(i + 1, self.use(used, known))
+                                                    for known in self.object_map[self.relevant_objects[i]]
+                                                    if not (self.remove_duplicates and known in used))
+
+        return self.assignment_counts[(i, used)]
+
+    def use(self, used: frozenset, known: str) -> frozenset:
+        # Without removing duplicates nothing gets used up, and keeping it empty keeps the counts cached together
+        return used | {known} if self.remove_duplicates else used
+
+    def sample(self) -> Optional[Dict[str, str]]:
+        """
+        Picks a random permutation, uniformly out of the ones assignments() goes over, and returns the mapping of
+        the relevant objects in it. Each relevant object is picked from the names that are left, weighted by how many
+        permutations that leaves, so nothing ever has to be thrown out for having a duplicate. The irrelevant objects
+        are only counted. Returns None if there aren't any permutations
+        """
+        used = frozenset()
+        if self.count_assignments(0, used) == 0:
+            return None
+
+        mapping = {"taxi": "taxi"}
+        for i, unknown in enumerate(self.relevant_objects):
+            options = [known for known in self.object_map[unknown] if not (self.remove_duplicates and known in used)]
+            weights = [self.count_assignments(i + 1, self.use(used, known)) for known in options]
+
+            known = random.choices(options, weights)[0]
+            mapping[unknown] = known
+            used = self.use(used, known)
+
+        return mapping
+
+    def applicable_rules(self, mapping: Dict[str, str]) -> list:
+        """The rules whose context applies to the state under mapping"""
+        return [rule for rule in self.rules if mapped_contains(self.literals.base_object, rule.context.base_object, mapping)]
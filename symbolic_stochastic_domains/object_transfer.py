@@ -5,11 +5,12 @@ Utility functions for evaluating deterministic 1-to-1 object mapping
 """
 
 from typing import List, Set
-import itertools
+import time
 
 import numpy as np
 
 from symbolic_stochastic_domains.symbolic_classes import RuleSet, Outcome, Example, PredicateTree
+from symbolic_stochastic_domains.object_permutations import ObjectPermutations
 
 
 class ObjectAssignment:
@@ -199,11 +200,13 @@ def determine_bindings_for_no_outcome(condition: PredicateTree, state: Predicate
     return ObjectAssignmentList(assignments)
 
 
-def information_gain_of_action(env, state: int, action: int, object_map, prev_ruleset: RuleSet, remove_duplicates=True) -> float:
+def information_gain_of_action(env, state: int, action: int, object_map, prev_ruleset: RuleSet, remove_duplicates=True,
+                               group_by_outcome=True, literals=None) -> float:
     """
     Returns the expected information gain from taking an action, given the current knowledge of the world.
     measured based on net decrease in number of possibilities in object map (wrong, it's better to have one go to 0
     then 3 go down by 1), use entropy total decrease instead)
+    If group_by_outcome, the new object map is computed once per predicted outcome instead of once per permutation
     """
     # List of known object names without taxi and with wall (wall is static so is not in the list normally)
     known_objects = set(env.OB_NAMES)
@@ -215,11 +218,12 @@ def information_gain_of_action(env, state: int, action: int, object_map, prev_ru
     # print(f"Action {action}")
     # print(f"Current object map: {object_map}")
 
-    literals, _ = env.get_literals(state)
+    if literals is None:
+        literals, _ = env.get_literals(state)
     # print(f"Literals: {literals}")
 
     # Get the rules that apply to this situation
-    applicable_rules = [rule for rule in prev_ruleset.rules if rule.action == action]
+    applicable_rules = prev_ruleset.rules_for_action(action)
     # assert len(applicable_rules) == 1, "My code only works for one rule for now"
     # for rule in applicable_rules:
     #     print(f"Applicable rules: {rule}")
@@ -227,85 +231,135 @@ def information_gain_of_action(env, state: int, action: int, object_map, prev_ru
 
     # Description of how my brute force algorithm works.
     # Step 1: There are some objects in the state, and some we have the whole list of previously known object
-    # Create every combination of mappings possible
-    # context_objects = set([diectic_obj.split("-")[-1] for diectic_obj in rule.context.referenced_objects])
-    state_objects = set([diectic_obj.split("-")[-1] for diectic_obj in literals.referenced_objects])
-    # print(f"Context objects: {context_objects}")
-    # print(f"State objects: {state_objects}")
+    # Create every combination of mappings possible. Only the objects the rules can see get permuted,
+    # the rest are counted so each assignment is weighted by how many permutations it stands for
+    permutations = ObjectPermutations(literals, object_map, applicable_rules, remove_duplicates)
+
+    # Find the predicted outcome for each permutation. The example we would learn from only differs by its outcome,
+    # so every permutation that predicts the same outcome leads to the same new object map. With group_by_outcome,
+    # count them up so each new object map only gets computed once. The outcome is identified by the rule that
+    # predicted it (None for no effect) because Outcome's == doesn't look at no_effect.
+    predictions = []  # [outcome, number of permutations]
+    classes = dict()  # Rule that applied to its index in predictions
+
+    for mapping, count in permutations.assignments():
+        applied, outcome = predict_outcome(permutations, mapping)
+        # print(f"Predicted outcome: {outcome}")
+
+        if group_by_outcome and id(applied) in classes:
+            predictions[classes[id(applied)]][1] += count
+        else:
+            classes[id(applied)] = len(predictions)
+            predictions.append([outcome, count])
 
     # Track total info gain and number of permutations so we can calculate an expected info gain
     total_info_gain = 0
     num_permutations = 0
 
-    mappings_to_choose_from = (object_map[unknown_object] for unknown_object in state_objects)
-    permutations = itertools.product(*mappings_to_choose_from)
+    for outcome, count in predictions:
+        num_permutations += count
+        total_info_gain += count * information_gain_of_outcome(action, literals, outcome, object_map, prev_ruleset,
+                                                               remove_duplicates)
 
-    # permutations = itertools.permutations(known_objects, len(state_objects))
-    # print("Permutations:")
-    for permutation in permutations:
-        # Remove ones where there is a duplicate assignment. Two objects can not be mapped to the same
-        # Technically there should be no reason why not but it breaks literals.copy_replace_names
-        if remove_duplicates and len(set(permutation)) != len(permutation):
-            continue
+    # Step 2: Assuming that mapping is the real one, see what would happen.
 
-        num_permutations += 1
+    # Step 3: Given what would happen and what we know, would we gain any information from that action?
 
-        mapping = {state_object: permute_object for state_object, permute_object in zip(state_objects, permutation)}
-        # print(mapping)
-        mapping["taxi"] = "taxi"  # Taxi has to be there but always maps to itself
+    # There is probably a less roundabout method of doing this. For example, maybe we only care about objects
+    # That are referenced the way the objects in the rule is referenced?
+    # See if the ones where those are the same have same/different effects
+    # print(f"Total info {total_info_gain}, num permutations: {num_permutations}")
+    return total_info_gain / num_permutations
 
-        new_literals = literals.copy_replace_names(mapping)
-        # print(f"New tree: {new_literals}")
 
-        # Check each rule. Because rules are constructed to be mutually exclusive, either one of them will
-        # be applicable, or none of them will be applicable.
-        # TODO: Could simply computations by noting there are some times where a rule will never apply.
-        # i.e., if it is missing edges that are relevant
+def predict_outcome(permutations: ObjectPermutations, mapping):
+    """Returns the rule that applies under mapping (None if none do) and the outcome it predicts"""
+    # Check each rule. Because rules are constructed to be mutually exclusive, either one of them will
+    # be applicable, or none of them will be applicable.
 
-        # If one rule applies, find that rule, otherwise, the effect will be NoEffect
-        outcome = Outcome([], [], no_effect=True)
-        for rule in applicable_rules:
-            # print(f"Rule: {rule}")
-            assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
+    # If one rule applies, find that rule, otherwise, the effect will be NoEffect
+    outcome = Outcome([], [], no_effect=True)
+    applied = None
+    for rule in permutations.applicable_rules(mapping):
+        assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
 
-            applicable = new_literals.base_object.contains(rule.context.base_object)
-            # print(f"Applicable: {applicable}")
-            # print()
+        # TODO Really you could put a break statement in here but I'm leaving in this assertion just to check
+        assert outcome.is_no_effect(), "A second rule was applicable which doesn't make sense"
+        outcome = rule.outcomes.outcomes[0]
+        applied = rule
 
-            if applicable:
-                # TODO Really you could put a break statement in here but I'm leaving in this assertion just to check
-                assert outcome.is_no_effect(), "A second rule was applicable which doesn't make sense"
-                outcome = rule.outcomes.outcomes[0]
+    return applied, outcome
 
-        # print(f"Predicted outcome: {outcome}")
 
-        # Get object assignments from this example. Is this the part that could be shortcut?
-        example = Example(action, literals, outcome)
-        possible_assignment = get_possible_object_assignments(example, prev_ruleset)
-        # print(f"Possible assignments: {possible_assignment}")
+def information_gain_of_outcome(action: int, literals, outcome: Outcome, object_map, prev_ruleset: RuleSet,
+                                remove_duplicates=True) -> float:
+    """How much the object map would narrow down if we took the action and saw outcome"""
+    # Get object assignments from this example
+    example = Example(action, literals, outcome)
+    possible_assignment = get_possible_object_assignments(example, prev_ruleset)
+    # print(f"Possible assignments: {possible_assignment}")
 
-        # print("Previous object map:")
-        # print(object_map)
+    new_object_map = determine_possible_object_maps(object_map, possible_assignment, remove_duplicates)
+    prev_num_options = sum(len(possibilities) for possibilities in object_map.values())
+    new_num_options = sum(len(possibilities) for possibilities in new_object_map.values())
 
-        new_object_map = determine_possible_object_maps(object_map, possible_assignment, remove_duplicates)
-        prev_num_options = sum(len(possibilities) for possibilities in object_map.values())
-        new_num_options = sum(len(possibilities) for possibilities in new_object_map.values())
+    # print(f"New object map: {new_object_map}")
+    # print(f"Length update: {prev_num_options}->{new_num_options}")
 
-        # print(f"New object map: {new_object_map}")
-        # print(f"Length update: {prev_num_options}->{new_num_options}")
+    # Info gain is change in bits required to express number of object possibilities, which is log2 of length
+    return np.log2(prev_num_options) - np.log2(new_num_options)
 
-        # Info gain is change in bits required to express number of object possibilities, which is log2 of length
-        total_info_gain += np.log2(prev_num_options) - np.log2(new_num_options)
 
-    # Step 2: Assuming that mapping is the real one, see what would happen.
+def estimate_information_gain_of_action(env, state: int, action: int, object_map, prev_ruleset: RuleSet,
+                                        remove_duplicates=True, literals=None, max_samples=200, max_time=None,
+                                        min_samples=20, z=2.0, exact_limit=1000) -> float:
+    """
+    Anytime estimate of information_gain_of_action, for when there are too many objects in view to try every
+    permutation. Samples permutations uniformly, and stops after max_samples, after max_time seconds, or once
+    the average is more than z standard errors above 0 (because every permutation's gain is >= 0, all that matters
+    to the planners is if it's positive). If there are at most exact_limit permutations, just does the exact version.
+    """
+    if literals is None:
+        literals, _ = env.get_literals(state)
 
-    # Step 3: Given what would happen and what we know, would we gain any information from that action?
+    applicable_rules = prev_ruleset.rules_for_action(action)
+    permutations = ObjectPermutations(literals, object_map, applicable_rules, remove_duplicates)
 
-    # There is probably a less roundabout method of doing this. For example, maybe we only care about objects
-    # That are referenced the way the objects in the rule is referenced?
-    # See if the ones where those are the same have same/different effects
-    # print(f"Total info {total_info_gain}, num permutations: {num_permutations}")
-    return total_info_gain / num_permutations
+    if permutations.size() <= exact_limit:
+        return information_gain_of_action(env, state, action, object_map, prev_ruleset, remove_duplicates,
+                                          literals=literals)
+
+    start = time.perf_counter()
+
+    # Gain for each rule that could apply, so each new object map still only gets computed once
+    gains = dict()
+
+    # Running mean and variance of the sampled gains (Welford's)
+    n, mean, m2 = 0, 0.0, 0.0
+
+    while n < max_samples:
+        mapping = permutations.sample()
+        if mapping is None:
+            # No permutation fits the object map at all, so there is nothing this action could tell apart
+            return 0.0
+
+        applied, outcome = predict_outcome(permutations, mapping)
+        if id(applied) not in gains:
+            gains[id(applied)] = information_gain_of_outcome(action, literals, outcome, object_map, prev_ruleset,
+                                                             remove_duplicates)
+
+        n += 1
+        delta = gains[id(applied)] - mean
+        mean += delta / n
+        m2 += delta * (gains[id(applied)] - mean)
+
+        if n >= min_samples and mean - z * np.sqrt(m2 / (n - 1) / n) > 0:
+            break
+
+        if max_time is not None and time.perf_counter() - start > max_time:
+            break
+
+    return mean
 
 
 def information_gain_of_state(env, state: int, object_map, prev_ruleset: RuleSet) -> float:
@@ -329,46 +383,25 @@ def determine_transition_given_action(env, state: int, action: int, object_map,
         literals, _ = env.get_literals(state)
 
     # Get the rules that apply to this situation
-    applicable_rules = [rule for rule in prev_ruleset.rules if rule.action == action]
+    applicable_rules = prev_ruleset.rules_for_action(action)
     # assert len(applicable_rules) == 1, "My code only works for one rule for now"
     # rule = applicable_rules[0]
 
-    # TODO: Exclude permutations that are not relavent to the rule, or not relevant to the current object map
-    # context_objects = set([diectic_obj.split("-")[-1] for diectic_obj in rule.context.referenced_objects])
-
-    # Objects that are currently in the state
-    state_objects = set([diectic_obj.split("-")[-1] for diectic_obj in literals.referenced_objects])
+    # Create all possible combinations of the state objects the rules can see and what we believe they could be.
+    # Then, check if all the outcomes match. Two objects can not be mapped to the same thing.
+    # TODO: Disable this or not? Make it a parameter?
+    permutations = ObjectPermutations(literals, object_map, applicable_rules)
 
     applicable_tracker = None  # Stores outcome as we process permutations so we can look for contradictions
 
-    # Filter the object map by only objects in the state. Then, create all possible combinations of state objects
-    # and what we believe they could be. Then, check if all the outcomes match.
-    mappings_to_choose_from = (object_map[unknown_object] for unknown_object in state_objects)
-    permutations = itertools.product(*mappings_to_choose_from)
-
-    for permutation in permutations:
-        # Remove ones where there is a duplicate assignment. Two objects can not be mapped to the same
-        # Technically there should be no reason why not but it breaks literals.copy_replace_names
-        # TODO: Disable this or not? Make it a parameter?
-        if len(set(permutation)) != len(permutation):
-            continue
-
-        mapping = {state_object: permute_object for state_object, permute_object in zip(state_objects, permutation)}
-        mapping["taxi"] = "taxi"  # Taxi has to be there but always maps to itself
-
-        new_literals = literals.copy_replace_names(mapping)
+    for rule in applicable_rules:
+        assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
 
+    for mapping, _ in permutations.assignments():
         # Because rules are constructed to be mutually exclusive, either one will apply, or neither will apply
         # If one applies, take that as the outcome. If none apply, then nothing happens. It's like an OR.
         # TODO: What if the same action leads to different outcomes depending on the rule?
-        any_applied = False
-        for rule in applicable_rules:
-            assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
-
-            applicable = new_literals.base_object.contains(rule.context.base_object)
-
-            if applicable:
-                any_applied = True
+        any_applied = len(permutations.applicable_rules(mapping)) > 0
 
         if applicable_tracker is None:
             applicable_tracker = any_applied
@@ -385,43 +418,30 @@ def determine_transition_given_action_2(action: int, object_map, prev_ruleset: R
     A version of the above where we assume a specific object mapping
     (so like, it won't return two outcomes one for key and one for gem)
     """
-    applicable_rules = [rule for rule in prev_ruleset.rules if rule.action == action]
+    applicable_rules = prev_ruleset.rules_for_action(action)
 
-    # Objects that are currently in the state
-    state_objects = set([diectic_obj.split("-")[-1] for diectic_obj in literals.referenced_objects])
+    # Duplicates are allowed here, the object map passed in is already narrowed down to one permutation
+    permutations = ObjectPermutations(literals, object_map, applicable_rules, remove_duplicates=False)
 
-    mappings_to_choose_from = (object_map[unknown_object] for unknown_object in state_objects)
-    permutations = itertools.product(*mappings_to_choose_from)
+    for rule in applicable_rules:
+        assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
 
     outcomes = []
-    for permutation in permutations:
-        mapping = {state_object: permute_object for state_object, permute_object in zip(state_objects, permutation)}
-        mapping["taxi"] = "taxi"  # Taxi has to be there but always maps to itself
-
-        new_literals = literals.copy_replace_names(mapping)
-
-        outcome = None
-        for i, rule in enumerate(applicable_rules):
-            assert len(rule.outcomes.outcomes) == 1, "Only deal with one possible outcome"
-
-            applicable = new_literals.base_object.contains(rule.context.base_object)
-
-            if applicable and outcome is None:
-                outcome = rule.outcomes.outcomes[0]
-            elif applicable:
-                print(literals)
-                print(mapping)
-                print(applicable_rules)
-                print(new_literals)
-                print(rule.context)
-                # assert False, "Can't have more than two rules apply"
-                print("ERROR: Can't have more than two rules apply! ignoring for now")
-                return None
-
-        if outcome is None:
+    for mapping, _ in permutations.assignments():
+        rules = permutations.applicable_rules(mapping)
+        if len(rules) > 1:
+            print(literals)
+            print(mapping)
+            print(applicable_rules)
+            print(rules[1].context)
+            # assert False, "Can't have more than two rules apply"
+            print("ERROR: Can't have more than two rules apply! ignoring for now")
+            return None
+
+        if len(rules) == 0:
             outcomes.append(Outcome([], [], no_effect=True))
         else:
-            outcomes.append(outcome)
+            outcomes.append(rules[0].outcomes.outcomes[0])
 
     all_the_same = all(outcome == outcomes[0] for outcome in outcomes)
 
@@ -442,7 +462,7 @@ def get_possible_object_assignments(example: Example, prev_ruleset: RuleSet) ->
     outcome = example.outcome
 
     # Get the rules that apply to this situation
-    applicable_rules = [rule for rule in prev_ruleset.rules if rule.action == action]
+    applicable_rules = prev_ruleset.rules_for_action(action)
 
     # To determine possible causes, loop over all rules. Some of them might not even apply,
     # So I think we first need to check if they could apply. Otherwise, ignore that rule?
@@ -1,5 +1,39 @@
 import itertools
 
+from symbolic_stochastic_domains.context_matcher import compile_state, compile_context
+
+
+class NameInterner:
+    """
+    Maps node names like "wall0" to (object name, object id, class id) so they only get parsed once.
+    The class id is a small int for the object name, shared by every tree.
+    """
+    def __init__(self):
+        self.names = dict()
+        self.class_ids = dict()
+        self.references = dict()
+
+    def parse(self, name: str):
+        if name not in self.names:
+            object_name = name[:-1]
+            if object_name not in self.class_ids:
+                self.class_ids[object_name] = len(self.class_ids)
+
+            self.names[name] = (object_name, int(name[-1]), self.class_ids[object_name])
+
+        return self.names[name]
+
+    def reference(self, from_name: str, type, to_name: str) -> str:
+        """The referenced object string for an edge. Shared, so every tree doesn't hold its own copy"""
+        key = (from_name, type, to_name)
+        if key not in self.references:
+            self.references[key] = f"{from_name}-{type.name}-{to_name}"
+
+        return self.references[key]
+
+
+NAMES = NameInterner()
+
 
 class PredicateTree:
     """
@@ -8,6 +42,9 @@ class PredicateTree:
     or taxi --TouchDown-- door --- door.open
     This can be continued for each object in the chain
     """
+    __slots__ = ("nodes", "node_lookup", "base_object", "str_repr", "referenced_objects", "state_bits", "context_bits",
+                 "tree_key", "tree_signature", "reference_tables")
+
     def __init__(self):
         self.nodes = []  # List of nodes
         self.node_lookup = dict()  # Dictionary mapping string ids to nodes
@@ -20,11 +57,33 @@ class PredicateTree:
 
         self.referenced_objects = set()  # Set of objects referred to (deictically) by this tree.
 
+        # Bitmask versions of this tree as a state or as a context, for fast matching. Built when first needed
+        # and cleared whenever the tree changes. See context_matcher.py
+        self.state_bits = None
+        self.context_bits = None
+
+        # Canonical tuple version of the tree, used for hashing and equality. Built when first needed
+        self.tree_key = None
+
+        # Same as the key but without the object ids. See signature
+        self.tree_signature = None
+
+        # Lookups from deictic references to the names of the nodes they refer to. See references
+        self.reference_tables = None
+
+    def changed(self):
+        """Clears everything cached about the tree. Called whenever it is modified"""
+        self.state_bits, self.context_bits, self.tree_key, self.str_repr = None, None, None, None
+        self.tree_signature, self.reference_tables = None, None
+
     def add_node(self, name):
         # Check for duplicates
         assert name not in self.node_lookup, f"already have node {name}"
 
-        new_node = Node(name[:-1], int(name[-1]))
+        self.changed()
+
+        object_name, object_id, class_id = NAMES.parse(name)
+        new_node = Node(object_name, object_id, class_id)
         self.nodes.append(new_node)
         self.node_lookup[name] = new_node
 
@@ -39,6 +98,11 @@ class PredicateTree:
         from_node = self.node_lookup[from_name]
         to_node = self.node_lookup[to_name]
 
+        self.changed()
+        self.connect(from_node, to_node, type, negative)
+
+    def connect(self, from_node, to_node, type, negative):
+        """Adds an edge between two nodes already in the tree"""
         edge = Edge(type)
 
         # Create the main pointer to the node, and the helper pointers pointing backwards
@@ -53,27 +117,88 @@ class PredicateTree:
 
         # Now that the object is being referenced, we can add how to the list of references objects
 
-        self.referenced_objects.add(f"{from_node.object_name}-{type.name}-{to_node.object_name}")
+        self.referenced_objects.add(NAMES.reference(from_node.object_name, type, to_node.object_name))
 
     def add_property(self, node_name, type, value):
+        self.changed()
         self.node_lookup[node_name].properties[type] = value
 
+    def compile_state(self):
+        """Compiles this tree as a state. Returns the feature int, or UNCOMPILABLE"""
+        self.state_bits = compile_state(self)
+        return self.state_bits
+
+    def compile_context(self):
+        """Compiles this tree as a rule context. Returns the (required, forbidden) masks, or UNCOMPILABLE"""
+        self.context_bits = compile_context(self)
+        return self.context_bits
+
+    def key(self):
+        """The canonical tuple for this tree. Trees with the same key are the same tree"""
+        if self.tree_key is None:
+            self.tree_key = self.base_object.key() if self.base_object is not None else ()
+
+        return self.tree_key
+
+    def signature(self):
+        """
+        Canonical tuple for the tree, ignoring the object ids (like string_no_numbers). Trees with the same
+        signature look the same to rules, like every state that isn't touching anything
+        """
+        if self.tree_signature is None:
+            self.tree_signature = self.base_object.signature() if self.base_object is not None else ()
+
+        return self.tree_signature
+
+    def references(self):
+        """
+        Two lookups for finding the node a deictic reference in an outcome is talking about, built once per tree:
+        (from object, edge type, object class) to the name of the lowest id node of that class whose incoming edge
+        matches, and edge type to the name of the node at the end of the first edge out of the base object of that type
+        """
+        if self.reference_tables is None:
+            by_reference = dict()
+            for node in sorted(self.nodes, key=lambda n: n.object_id):
+                if len(node.to_edges) > 0:
+                    edge = node.to_edges[0]
+                    by_reference.setdefault((edge.from_node.object_name, edge.type, node.object_name), node.full_name())
+
+            by_edge_type = dict()
+            if self.base_object is not None:
+                for edge in self.base_object.edges:
+                    by_edge_type.setdefault(edge.type, edge.to_node.full_name())
+
+            self.reference_tables = (by_reference, by_edge_type)
+
+        return self.reference_tables
+
     def copy(self):
         """Create a copy of this tree"""
         ret = PredicateTree()
 
+        # The names are already known to be unique, so skip add_node and build the nodes directly
+        copies = dict()  # Original node to its copy
         for node in self.nodes:
-            ret.add_node(node.full_name())
+            new_node = Node(node.object_name, node.object_id, node.class_id)
+            new_node.properties = node.properties.copy()
+            copies[node] = new_node
+            ret.nodes.append(new_node)
+            ret.node_lookup[node.full_name()] = new_node
 
-            for k, v in node.properties.items():
-                ret.add_property(node.full_name(), k, v)
+        if len(ret.nodes) > 0:
+            ret.base_object = ret.nodes[0]
 
         for node in self.nodes:
             for edge in node.edges:
-                ret.add_edge(node.full_name(), edge.to_node.full_name(), edge.type)
+                ret.connect(copies[node], copies[edge.to_node], edge.type, False)
 
             for edge in node.negative_edges:
-                ret.add_edge(node.full_name(), edge.to_node.full_name(), edge.type, negative=True)
+                ret.connect(copies[node], copies[edge.to_node], edge.type, True)
+
+        # Copies are equal, so anything already computed about this tree is true for the copy too
+        ret.tree_key, ret.str_repr, ret.tree_signature = self.tree_key, self.str_repr, self.tree_signature
+        ret.state_bits, ret.context_bits = self.state_bits, self.context_bits
+        ret.reference_tables = self.reference_tables
 
         return ret
 
@@ -125,26 +250,31 @@ class PredicateTree:
     def __repr__(self):
         return self.__str__()
 
-    def __hash__(self):
-        # Due to sorting, identical trees will always have the same strs
-        return hash(self.str_repr)
+    def __getstate__(self):
+        # The compiled bits and class ids are only meaningful inside the process that made them, so don't pickle them
+        return {name: getattr(self, name) for name in ("nodes", "node_lookup", "base_object", "referenced_objects")}
 
-    def __eq__(self, other):
-        # Convert to strings to compare
-        if self.str_repr is None:
-            self.str_repr = self.__str__()
+    def __setstate__(self, state):
+        # Also loads trees pickled before slots, which have every field in their state dict
+        for name in ("nodes", "node_lookup", "base_object", "referenced_objects"):
+            setattr(self, name, state[name])
+        self.changed()
 
-        if other.str_repr is None:
-            other.str_repr = other.__str__()
+    def __hash__(self):
+        return hash(self.key())
 
-        return self.str_repr == other.str_repr
+    def __eq__(self, other):
+        return self.key() == other.key()
 
 
 class Node:
     """A node in the tree is an object, connected one-directionally to other objects via predicate edges"""
-    def __init__(self, object_name, object_id):
+    __slots__ = ("object_name", "object_id", "class_id", "edges", "to_edges", "negative_edges", "properties")
+
+    def __init__(self, object_name, object_id, class_id=None):
         self.object_name = object_name
         self.object_id = object_id
+        self.class_id = class_id if class_id is not None else NAMES.parse(object_name + str(object_id))[2]
 
         self.edges = []  # List of edges going out of this node
         self.to_edges = []  # List of edges going into this node. Used for traveling back up the chain
@@ -221,6 +351,34 @@ class Node:
     def full_name(self):
         return self.object_name + str(self.object_id)
 
+    def key(self):
+        """Canonical tuple for this node and everything below it, with the names and types as ints"""
+        return (
+            self.class_id,
+            self.object_id,
+            tuple(sorted((key.value, value) for key, value in self.properties.items())),
+            tuple(sorted((edge.type.value, edge.to_node.key()) for edge in self.edges)),
+            tuple(sorted((edge.type.value, edge.to_node.class_id, edge.to_node.object_id)
+                         for edge in self.negative_edges)),
+        )
+
+    def signature(self):
+        """Same as key, without the object ids"""
+        return (
+            self.class_id,
+            tuple(sorted((key.value, value) for key, value in self.properties.items())),
+            tuple(sorted((edge.type.value, edge.to_node.signature()) for edge in self.edges)),
+            tuple(sorted((edge.type.value, edge.to_node.class_id) for edge in self.negative_edges)),
+        )
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in Node.__slots__ if name != "class_id"}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.class_id = NAMES.parse(self.full_name())[2]
+
     def str_helper(self):
         ret = ""
 
@@ -288,6 +446,8 @@ class Node:
 
 class Edge:
     """An edge consists of a predicate type and an end node"""
+    __slots__ = ("type", "to_node", "from_node")
+
     def __init__(self, type):
         self.type = type  # Predicate type of the edge (TOUCH_DOWN, IN, etc)
         self.to_node = None  # Pointer to the node this edge is connected to
@@ -296,6 +456,13 @@ class Edge:
     def str_no_numbers(self):
         return f"{self.type.name}-{self.to_node.object_name}"
 
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in Edge.__slots__}
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def __str__(self):
         return f"{self.type.name}-{self.to_node.full_name()}"
 
@@ -0,0 +1,57 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Cache of what the object transfer models predict will happen when taking an action, so the planners don't
+redo the permutation analysis for every state they expand. The prediction only depends on what the literal tree
+looks like to the rules (its signature, without object ids) and the action, as long as the model's beliefs
+(object map, rulesets) don't change. So it is keyed by those, and emptied whenever the belief version changes.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable
+
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+
+
+class PredictionCache:
+    """Bounded LRU cache from (literal signature, action) to a prediction, for one version of the beliefs"""
+    def __init__(self, max_size: int = 100000):
+        self.max_size = max_size
+        self.predictions = OrderedDict()
+
+        # Version of the beliefs the predictions were made with
+        self.version = None
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, literals: PredicateTree, action: int, predict: Callable[[], Any]):
+        """Returns the cached prediction, or calls predict to make it. Predictions can be None (unknown)"""
+        if version != self.version:
+            self.predictions.clear()
+            self.version = version
+
+        key = (literals.signature(), action)
+
+        if key in self.predictions:
+            self.hits += 1
+            self.predictions.move_to_end(key)
+        else:
+            self.misses += 1
+            self.predictions[key] = predict()
+            if len(self.predictions) > self.max_size:
+                self.predictions.popitem(last=False)
+
+        return self.predictions[key]
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def clear(self):
+        self.predictions.clear()
+        self.version = None
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self.predictions)
@@ -0,0 +1,77 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Memo of the rulesets learned when trying out object permutations. From one step to the next most permutations
+remap the new examples the same way as before (plus the latest example), and different permutations often remap
+them to the same examples too, so the same example sets keep getting learned from scratch. Learning only depends
+on the examples, so the result is stored by the remapped examples that were added to the prior examples.
+"""
+
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from symbolic_stochastic_domains.symbolic_classes import Example, RuleSet
+
+
+class RulesetMemo:
+    """
+    Bounded LRU memo from the remapped examples (in the order they were added) to (complexity, ruleset).
+    Only valid for one set of prior examples, so there should be one per prior. The size of each entry is
+    estimated as its number of examples plus the number of nodes in its rules (pickling them to get the real size
+    costs about as much as some of the learning it saves), and the oldest entries are thrown out when over max_size
+    """
+    def __init__(self, max_size: int = 200_000):
+        self.max_size = max_size
+        self.results = OrderedDict()
+
+        self.sizes = dict()  # Estimated size of each entry
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(examples: List[Example]) -> tuple:
+        # Examples hash by their strings, and the order matters because the learner sees them in this order
+        return tuple(examples)
+
+    def get(self, examples: List[Example]) -> Optional[Tuple[int, RuleSet]]:
+        key = self.key(examples)
+
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+
+        self.misses += 1
+        return None
+
+    def add(self, examples: List[Example], complexity: int, ruleset: RuleSet):
+        key = self.key(examples)
+        if key in self.results:
+            return
+
+        size = len(key) + sum(len(rule.context.nodes) for rule in ruleset.rules)
+        if size > self.max_size:
+            return  # Would throw everything else out and still not fit
+
+        self.results[key] = (complexity, ruleset)
+        self.sizes[key] = size
+        self.size += size
+
+        while self.size > self.max_size:
+            old_key, _ = self.results.popitem(last=False)
+            self.size -= self.sizes.pop(old_key)
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total > 0 else 0.0
+
+    def clear(self):
+        self.results.clear()
+        self.sizes.clear()
+        self.size = 0
+        self.hits, self.misses = 0, 0
+
+    def __len__(self):
+        return len(self.results)
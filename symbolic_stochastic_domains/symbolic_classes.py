@@ -1,4 +1,5 @@
-from typing import List, Dict
+from collections.abc import MutableMapping
+from typing import List, Dict, Tuple
 
 from effects.effect import Effect
 from symbolic_stochastic_domains.predicates_and_objects import PredicateType
@@ -213,14 +214,15 @@ class ExampleSet:
         for example in examples:
             self.remove_example(example)
 
-    def referenced_object_names(self):
+    def referenced_object_names(self) -> List[str]:
         # A list of names that are referenced in the example set. Obviously, this is not a very efficient way to do this
         object_names = set()
         for example in self.examples.keys():
             for name in example.state.referenced_objects:
                 object_names.add(name.split("-")[-1])
 
-        return object_names
+        # Sorted, because the order decides which literal FOIL picks in ties, and set order depends on the hash seed
+        return sorted(object_names)
 
     def copy(self):
         ret = ExampleSet()
@@ -240,6 +242,68 @@ class ExampleSet:
         return self.__str__()
 
 
+class OverlayCounts(MutableMapping):
+    """
+    Example counts of a base dict plus changes to them, that acts like a dict of the merged counts without copying the
+    base. Iterates in the same order a dict with the changes made to it would (except a removed and re-added example
+    keeps its old place). The base must not change while this is in use
+    """
+    def __init__(self, base: Dict[Example, int]):
+        self.base = base
+
+        # New count of each example that was changed. 0 means it was removed
+        self.changes: Dict[Example, int] = dict()
+
+    def __getitem__(self, example):
+        count = self.changes.get(example)
+        if count is None:
+            return self.base[example]
+        if count == 0:
+            raise KeyError(example)
+        return count
+
+    def __setitem__(self, example, count):
+        self.changes[example] = count
+
+    def __delitem__(self, example):
+        if example not in self:
+            raise KeyError(example)
+        self.changes[example] = 0
+
+    def __contains__(self, example):
+        count = self.changes.get(example)
+        return example in self.base if count is None else count != 0
+
+    def __iter__(self):
+        changes = self.changes
+        if len(changes) == 0:
+            yield from self.base
+            return
+
+        for example in self.base:
+            if changes.get(example) != 0:
+                yield example
+
+        for example, count in changes.items():
+            if count != 0 and example not in self.base:
+                yield example
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class ExampleSetOverlay(ExampleSet):
+    """
+    An ExampleSet that is a base ExampleSet plus some added or removed examples, without copying or changing the base.
+    Good for trying out lots of different extra examples on one big set, like each object permutation's remapped
+    examples on the prior examples. Works anywhere an ExampleSet does (like the learner), since it only uses .examples
+    """
+    def __init__(self, base: ExampleSet):
+        super().__init__()
+        self.base = base
+        self.examples = OverlayCounts(base.examples)
+
+
 class Rule:
     """A rule consists of a action, set of deictic references?, context, and outcome set"""
     def __init__(self, action, context, outcomes):
@@ -262,8 +326,17 @@ class Rule:
 
 
 class RuleSet:
-    """A collection of rules"""
+    """
+    A collection of rules. The rules are kept in a tuple so they can't be changed in place without rules_key and
+    action_index finding out. Set rules or use add_rule instead (and don't change the Rules themselves either)
+    """
     def __init__(self, rules: List[Rule]):
+        # Hashable version of the rules, built when first needed. See rules_key
+        self.key = None
+
+        # Rules for each action, and which of those could apply given the edges in a state. See action_index
+        self.index = None
+
         self.rules = rules
 
         # Keeps track of how many outcomes in the example set of the current session,
@@ -272,8 +345,84 @@ class RuleSet:
         self.default_rule_num_noise = 0
         self.default_rule_covered_examples: List[Example] = []
 
+    @property
+    def rules(self) -> Tuple[Rule, ...]:
+        return self.current_rules
+
+    @rules.setter
+    def rules(self, rules: List[Rule]):
+        self.current_rules = tuple(rules)
+        self.key = None
+        self.index = None
+
+    def __setstate__(self, state):
+        # Rulesets pickled before this stored the rules directly, as a list
+        if "rules" in state:
+            state["current_rules"] = tuple(state.pop("rules"))
+
+        self.__dict__.update(state)
+
     def add_rule(self, rule: Rule):
-        self.rules.append(rule)
+        self.rules = self.rules + (rule,)
+
+    def rules_key(self):
+        """
+        Tuple of the rules as strings, in order. Two rulesets with the same key are the same rules.
+        Only built once, so checking if the rules changed doesn't mean printing the whole ruleset every time
+        """
+        # Rulesets pickled before this won't have a key
+        if getattr(self, "key", None) is None:
+            self.key = tuple(str(rule) for rule in self.rules)
+
+        return self.key
+
+    def action_index(self) -> Dict[int, tuple]:
+        """
+        For each action, (its rules in order, rules by one (edge type, object class) their context needs the taxi to
+        have, rules that don't need any edge). A rule can only apply to a state with that edge, so most rules never get
+        their context checked. Only built once, like rules_key
+        """
+        # Rulesets pickled before this won't have an index
+        if getattr(self, "index", None) is None:
+            self.index = dict()
+            for rule in self.rules:
+                rules, by_edge, edgeless = self.index.setdefault(rule.action, ([], dict(), []))
+                rules.append(rule)
+
+                # The default rule's context is just a list
+                context = rule.context
+                edges = context.base_object.edges if isinstance(context, PredicateTree) and context.base_object else []
+                if len(edges) == 0:
+                    edgeless.append(rule)
+                else:
+                    by_edge.setdefault((edges[0].type, edges[0].to_node.object_name), []).append(rule)
+
+        return self.index
+
+    def rules_for_action(self, action: int) -> List[Rule]:
+        """The rules with this action, in order. Don't modify the list"""
+        index = self.action_index()
+        return index[action][0] if action in index else []
+
+    def candidate_rules(self, action: int, state: PredicateTree) -> List[Rule]:
+        """
+        The rules with this action that could apply to the state, in order. Their contexts still need checking
+        with context_matches, this only throws out the ones missing an edge they need
+        """
+        index = self.action_index()
+        if action not in index:
+            return []
+
+        rules, by_edge, edgeless = index[action]
+        if len(by_edge) == 0:
+            return rules
+
+        candidates = set(edgeless)
+        for edge in state.base_object.edges:
+            candidates.update(by_edge.get((edge.type, edge.to_node.object_name), []))
+
+        # Keep them in the ruleset's order
+        return [rule for rule in rules if rule in candidates]
 
     def copy(self):
         # TODO? Do I need to copy the default rule stuff, I think not because it always gets filled in
@@ -2,6 +2,7 @@ from typing import List, Set, Dict
 
 from symbolic_stochastic_domains.symbolic_classes import Outcome, Example, Rule
 from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from symbolic_stochastic_domains.context_matcher import UNCOMPILABLE
 
 
 def context_matches(context: PredicateTree, state: PredicateTree) -> bool:
@@ -13,7 +14,14 @@ def context_matches(context: PredicateTree, state: PredicateTree) -> bool:
     # Need to check that there exists the context tree contained in the state tree
     # This could be framed recursively by saying there is a node in the context, and all of it's edges
     # are in the state, and all of the edges nodes are contained in the state's edges' nodes
-    return state.base_object.contains(context.base_object)
+    # That is slow though, so both trees are compiled to bitmasks when possible (see context_matcher.py)
+    masks = context.context_bits if context.context_bits is not None else context.compile_context()
+    features = state.state_bits if state.state_bits is not None else state.compile_state()
+    if masks is UNCOMPILABLE or features is UNCOMPILABLE:
+        return state.base_object.contains(context.base_object)
+
+    required, forbidden = masks
+    return (features & required) == required and not features & forbidden
 
 
 def covers(outcome: Outcome, example: Example) -> bool:
@@ -0,0 +1,76 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Time and memory benchmark of the predicate trees over the heist examples.
+Times building trees (get_literals), copying them, and comparing/hashing them, and measures how much
+memory holding all the example states takes. Run as python -m test.benchmark_predicate_tree
+"""
+
+import random
+import time
+import tracemalloc
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+
+
+def collect_states(env, steps):
+    states = []
+    for _ in range(steps):
+        action = random.randint(0, env.get_num_actions() - 1)
+        literals, _, _ = env.step(action)
+        states.append(literals)
+
+        if env.end_of_episode():
+            env.restart()
+
+    return states
+
+
+def benchmark(steps=5000, repeats=3):
+    random.seed(1)
+    np.random.seed(1)
+    env = SymbolicHeist(stochastic=False)
+
+    start_time = time.perf_counter()
+    states = collect_states(env, steps)
+    end_time = time.perf_counter()
+    print(f"Stepped {steps} times (env.step + cached get_literals): {end_time - start_time:.3f}s")
+
+    # Building the trees without the literal cache
+    flat_states = list(env.get_literals_cache().keys())
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for state in flat_states:
+            env.build_literals(state)
+    end_time = time.perf_counter()
+    print(f"Built {len(flat_states)} states {repeats} times (build_literals): {end_time - start_time:.3f}s")
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        copies = [state.copy() for state in states]
+    end_time = time.perf_counter()
+    print(f"Copied {steps} states {repeats} times: {end_time - start_time:.3f}s")
+
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        for state, state_copy in zip(states, copies):
+            assert state == state_copy
+        unique = len(set(copies))
+    end_time = time.perf_counter()
+    print(f"Compared and hashed {steps} states {repeats} times: {end_time - start_time:.3f}s ({unique} unique)")
+
+    # Memory of a fresh copy of every state
+    tracemalloc.start()
+    snapshot_start = tracemalloc.take_snapshot()
+    copies = [state.copy() for state in states]
+    snapshot_end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in snapshot_end.compare_to(snapshot_start, "filename"))
+    print(f"Memory for {steps} states: {size / 1024:.1f} KiB ({size / steps:.0f} bytes per state)")
+
+
+if __name__ == "__main__":
+    benchmark()
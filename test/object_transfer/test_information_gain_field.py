@@ -0,0 +1,70 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the cached information gain matches calling information_gain_of_action directly
+"""
+
+import random
+
+import numpy as np
+
+from effects.effect import Increment, SetToNumber
+from environment.symbolic_heist import SymbolicHeist
+from algorithm.symbolic_domains.object_transfer_model import ObjectTransferModel
+from policy.information_gain_field import InformationGainField
+from symbolic_stochastic_domains.predicates_and_objects import PredicateType
+from symbolic_stochastic_domains.symbolic_classes import RuleSet, DeicticReference
+from symbolic_stochastic_domains.object_transfer import information_gain_of_action
+from test.object_transfer.test_object_permutations import make_heist_rule
+
+
+def make_model():
+    random.seed(1)
+    np.random.seed(1)
+    env = SymbolicHeist(stochastic=False, shuffle_object_names=True)
+
+    ruleset = RuleSet([
+        make_heist_rule(0, PredicateType.TOUCH_UP, "wall", True, DeicticReference("taxi", None, None, "y"), Increment(0, 1)),
+        make_heist_rule(5, PredicateType.TOUCH_LEFT, "lock", False,
+                        DeicticReference("taxi", PredicateType.TOUCH_LEFT, "lock", "state"), SetToNumber(0, 1)),
+    ])
+
+    return ObjectTransferModel(env, ruleset)
+
+
+def test_field_matches_direct():
+    for eager in [False, True]:
+        model = make_model()
+        env = model.env
+        num_actions = env.get_num_actions()
+        field = InformationGainField(model, num_actions, eager=eager)
+
+        states = []
+        for _ in range(10):
+            env.restart()
+            states.append(env.get_state())
+
+        for state in states:
+            for action in range(num_actions):
+                expected = information_gain_of_action(env, state, action, model.object_map, model.previous_ruleset)
+                assert np.isclose(field.get(state, action), expected)
+
+        # Only one entry per distinct signature and action
+        if not eager:
+            signatures = set(env.get_literals(state)[0].signature() for state in states)
+            assert len(field.gains) == len(signatures) * num_actions
+
+        # Changing the beliefs throws out the old gains
+        model.version += 1
+        field.get(states[0], 0)
+        assert field.gains.version == model.version
+        if eager:
+            # Everything the env has seen gets scored again
+            signatures = set(literals.signature() for literals, _ in env.get_literals_cache().values())
+            assert len(field.gains) == len(signatures) * num_actions
+        else:
+            assert len(field.gains) == 1
+
+
+if __name__ == "__main__":
+    test_field_matches_direct()
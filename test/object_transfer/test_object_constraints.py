@@ -0,0 +1,69 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks that propagating constraints as they come in ends up with the same object map as rerunning
+determine_possible_object_maps over every assignment seen so far until nothing changes
+"""
+
+import random
+
+from symbolic_stochastic_domains.object_transfer import ObjectAssignment, ObjectAssignmentList, determine_possible_object_maps
+from symbolic_stochastic_domains.object_constraints import ObjectMapConstraints
+
+
+def random_assignment_list(truth, known_names):
+    """1 to 3 assignments about the same object, at least one of which is true"""
+    assignments = []
+    unknown = random.choice(list(truth.keys()))
+    for i in range(random.randint(1, 3)):
+        assignment = ObjectAssignment()
+
+        # The first one is always true, the rest are whatever
+        if random.random() < 0.5:
+            known = truth[unknown] if i == 0 else random.choice(known_names)
+            assignment.add_positive(unknown, known)
+        else:
+            known = random.choice([name for name in known_names if name != truth[unknown]]) if i == 0 else random.choice(known_names)
+            assignment.add_negative(unknown, known)
+
+        assignments.append(assignment)
+
+    random.shuffle(assignments)
+    return ObjectAssignmentList(assignments)
+
+
+def test_matches_full_recompute():
+    random.seed(0)
+    known_names = ["key", "lock", "gem", "wall", "door", "button"]
+
+    for trial in range(50):
+        shuffled = known_names.copy()
+        random.shuffle(shuffled)
+        truth = {f"ob{i}": name for i, name in enumerate(shuffled)}
+
+        object_map = {unknown: known_names.copy() for unknown in truth}
+        constraints = ObjectMapConstraints(object_map, known_names)
+
+        all_assignments = []
+        for step in range(15):
+            assignment_list = random_assignment_list(truth, known_names)
+            all_assignments.append(assignment_list)
+
+            constraints.add_constraints([assignment_list])
+
+            # The old way, but repeated until it stops changing
+            while True:
+                new_object_map = determine_possible_object_maps(object_map, all_assignments)
+                if new_object_map == object_map:
+                    break
+                object_map = new_object_map
+
+            assert constraints.object_map() == object_map
+
+            # The truth should never be ruled out
+            for unknown, known in truth.items():
+                assert known in object_map[unknown]
+
+
+if __name__ == "__main__":
+    test_matches_full_recompute()
@@ -0,0 +1,205 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the relevance pruned permutations against brute force renaming every permutation of the object map
+"""
+
+import itertools
+import random
+from collections import Counter
+
+import numpy as np
+
+from effects.effect import Increment, SetToNumber
+from environment.symbolic_heist import SymbolicHeist
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from symbolic_stochastic_domains.predicates_and_objects import PredicateType
+from symbolic_stochastic_domains.symbolic_classes import Rule, RuleSet, Outcome, OutcomeSet, DeicticReference
+from symbolic_stochastic_domains.object_permutations import ObjectPermutations, mapped_contains
+from symbolic_stochastic_domains.object_transfer import information_gain_of_action, estimate_information_gain_of_action
+
+
+def make_state():
+    state = PredicateTree()
+    for name in ["taxi0", "a0", "b0", "c0", "d0", "e0"]:
+        state.add_node(name)
+
+    state.add_edge("taxi0", "a0", PredicateType.TOUCH_LEFT)
+    state.add_edge("taxi0", "b0", PredicateType.TOUCH_RIGHT)
+    state.add_edge("taxi0", "c0", PredicateType.TOUCH_UP)
+    state.add_edge("taxi0", "d0", PredicateType.TOUCH_DOWN)
+    state.add_edge("taxi0", "e0", PredicateType.IN)
+    state.add_property("a0", PredicateType.OPEN, True)
+    return state
+
+
+def make_rules():
+    # Touching an open lock on the left, and not holding a key
+    context1 = PredicateTree()
+    context1.add_node("taxi0")
+    context1.add_node("lock0")
+    context1.add_node("key0")
+    context1.add_edge("taxi0", "lock0", PredicateType.TOUCH_LEFT)
+    context1.add_edge("taxi0", "key0", PredicateType.IN, negative=True)
+    context1.add_property("lock0", PredicateType.OPEN, True)
+
+    # Not touching a wall on the right
+    context2 = PredicateTree()
+    context2.add_node("taxi0")
+    context2.add_node("wall0")
+    context2.add_edge("taxi0", "wall0", PredicateType.TOUCH_RIGHT, negative=True)
+
+    return [Rule(0, context1, None), Rule(0, context2, None)]
+
+
+def brute_force(state, object_map, rules, remove_duplicates):
+    """Counts (relevant mapping, which rules apply) over every permutation, the old way"""
+    state_objects = sorted(object_map.keys())
+    counts = Counter()
+    for permutation in itertools.product(*(object_map[name] for name in state_objects)):
+        if remove_duplicates and len(set(permutation)) != len(permutation):
+            continue
+
+        mapping = dict(zip(state_objects, permutation))
+        mapping["taxi"] = "taxi"
+        new_state = state.copy_replace_names(mapping)
+        applies = tuple(new_state.base_object.contains(rule.context.base_object) for rule in rules)
+        counts[(mapping["a"], mapping["b"], mapping["e"], applies)] += 1
+
+    return counts
+
+
+def test_permutations_match_brute_force():
+    state = make_state()
+    rules = make_rules()
+    names = ["lock", "key", "wall", "gem", "door"]
+    object_map = {"a": ["lock", "wall"], "b": ["wall", "gem", "key"], "c": names.copy(), "d": names.copy(), "e": ["key", "gem"]}
+
+    for remove_duplicates in [True, False]:
+        permutations = ObjectPermutations(state, object_map, rules, remove_duplicates)
+
+        # Only the objects at the end of edges the rules look at should be permuted
+        assert permutations.relevant_objects == ["a", "b", "e"]
+        assert permutations.irrelevant_objects == ["c", "d"]
+
+        counts = Counter()
+        for mapping, count in permutations.assignments():
+            applies = tuple(mapped_contains(state.base_object, rule.context.base_object, mapping) for rule in rules)
+            assert applies == tuple(rule in permutations.applicable_rules(mapping) for rule in rules)
+            counts[(mapping["a"], mapping["b"], mapping["e"], applies)] += count
+
+        assert counts == brute_force(state, object_map, rules, remove_duplicates)
+
+
+def test_sample_is_uniform():
+    random.seed(0)
+    state = make_state()
+    rules = make_rules()
+    # Few enough names that most independent draws would have a duplicate
+    names = ["lock", "key", "wall", "gem", "door"]
+    object_map = {"a": ["lock", "wall"], "b": ["wall", "gem", "key"], "c": names.copy(), "d": names.copy(), "e": ["key", "gem"]}
+
+    for remove_duplicates in [True, False]:
+        permutations = ObjectPermutations(state, object_map, rules, remove_duplicates)
+        expected = {tuple(sorted(mapping.items())): count for mapping, count in permutations.assignments()}
+        total = sum(expected.values())
+        assert permutations.count_assignments(0, frozenset()) == total
+
+        num_samples = 20000
+        sampled = Counter(tuple(sorted(permutations.sample().items())) for _ in range(num_samples))
+        assert set(sampled.keys()) <= set(expected.keys())
+        for mapping, count in expected.items():
+            assert abs(sampled[mapping] / num_samples - count / total) < 0.02
+
+
+def test_no_consistent_permutations():
+    state = make_state()
+    object_map = {"a": ["lock"], "b": ["lock"], "c": ["wall"], "d": ["gem"], "e": ["key"]}
+
+    assert list(ObjectPermutations(state, object_map, make_rules()).assignments()) == []
+    assert ObjectPermutations(state, object_map, make_rules()).sample() is None
+    assert len(list(ObjectPermutations(state, object_map, make_rules(), remove_duplicates=False).assignments())) == 1
+
+
+def make_heist_rule(action, edge_type, name, negative, reference, effect):
+    context = PredicateTree()
+    context.add_node("taxi0")
+    context.add_node(name + "0")
+    context.add_edge("taxi0", name + "0", edge_type, negative=negative)
+
+    outcomes = OutcomeSet()
+    outcomes.add_outcome(Outcome([reference], [effect]), 1.0)
+    return Rule(action, context, outcomes)
+
+
+def make_heist_ruleset():
+    return RuleSet([
+        make_heist_rule(0, PredicateType.TOUCH_UP, "wall", True, DeicticReference("taxi", None, None, "y"), Increment(0, 1)),
+        make_heist_rule(4, PredicateType.ON, "key", False,
+                        DeicticReference("taxi", PredicateType.ON, "key", "state"), SetToNumber(0, 1)),
+        make_heist_rule(5, PredicateType.TOUCH_LEFT, "lock", False,
+                        DeicticReference("taxi", PredicateType.TOUCH_LEFT, "lock", "state"), SetToNumber(0, 1)),
+    ])
+
+
+def test_grouped_information_gain_matches():
+    random.seed(1)
+    np.random.seed(1)
+    env = SymbolicHeist(stochastic=False, shuffle_object_names=True)
+    ruleset = make_heist_ruleset()
+
+    names = ["key", "lock", "gem", "wall"]
+    object_map = {unknown: names.copy() for unknown in env.get_object_names() if unknown != "taxi"}
+
+    any_gain = False
+    for _ in range(10):
+        env.restart()
+        state = env.get_state()
+        for action in [0, 4, 5]:
+            for remove_duplicates in [True, False]:
+                grouped = information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates)
+                separate = information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates,
+                                                      group_by_outcome=False)
+                assert np.isclose(grouped, separate)
+                any_gain = any_gain or grouped > 0
+
+    assert any_gain
+
+
+def test_estimated_information_gain():
+    random.seed(2)
+    np.random.seed(2)
+    env = SymbolicHeist(stochastic=False, shuffle_object_names=True)
+    ruleset = make_heist_ruleset()
+
+    names = ["key", "lock", "gem", "wall"]
+    object_map = {unknown: names.copy() for unknown in env.get_object_names() if unknown != "taxi"}
+
+    for _ in range(5):
+        env.restart()
+        state = env.get_state()
+        for action in [0, 4, 5]:
+            for remove_duplicates in [True, False]:
+                exact = information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates)
+
+                # Small enough to just do it exactly
+                assert estimate_information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates) == exact
+
+                # Force sampling, and don't stop early
+                estimate = estimate_information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates,
+                                                               max_samples=2000, min_samples=2000, exact_limit=0)
+                assert abs(estimate - exact) < 0.1
+                assert (estimate > 0) == (exact > 0)
+
+                # Stopping as soon as it's sure the gain is positive
+                early = estimate_information_gain_of_action(env, state, action, object_map, ruleset, remove_duplicates,
+                                                            max_samples=2000, exact_limit=0)
+                assert (early > 0) == (exact > 0)
+
+
+if __name__ == "__main__":
+    test_permutations_match_brute_force()
+    test_sample_is_uniform()
+    test_no_consistent_permutations()
+    test_grouped_information_gain_matches()
+    test_estimated_information_gain()
@@ -0,0 +1,59 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Tests the literal signatures and the prediction cache the object transfer models use
+"""
+
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from symbolic_stochastic_domains.predicates_and_objects import PredicateType
+from symbolic_stochastic_domains.prediction_cache import PredictionCache
+
+
+def make_tree(wall_id, key_id, key_edge=PredicateType.TOUCH_RIGHT):
+    tree = PredicateTree()
+    tree.add_node("taxi0")
+    tree.add_node(f"wall{wall_id}")
+    tree.add_node(f"key{key_id}")
+    tree.add_edge("taxi0", f"wall{wall_id}", PredicateType.TOUCH_LEFT)
+    tree.add_edge("taxi0", f"key{key_id}", key_edge)
+    return tree
+
+
+def test_signature_ignores_ids():
+    assert make_tree(0, 1) != make_tree(2, 0)
+    assert make_tree(0, 1).signature() == make_tree(2, 0).signature()
+    assert make_tree(0, 1).signature() != make_tree(0, 1, PredicateType.TOUCH_UP).signature()
+
+    # Properties count
+    tree = make_tree(0, 1)
+    tree.add_property("key1", PredicateType.OPEN, True)
+    assert tree.signature() != make_tree(0, 1).signature()
+    assert tree.copy().signature() == tree.signature()
+
+
+def test_cache_hits_and_invalidates():
+    cache = PredictionCache()
+    calls = []
+
+    def predict():
+        calls.append(1)
+        return None if len(calls) == 1 else len(calls)
+
+    # None is a prediction too (unknown) and still gets cached
+    assert cache.get(0, make_tree(0, 1), 2, predict) is None
+    assert cache.get(0, make_tree(3, 0), 2, predict) is None
+    assert len(calls) == 1
+
+    # Different action is a different prediction
+    assert cache.get(0, make_tree(0, 1), 3, predict) == 2
+
+    # New beliefs throw everything out
+    assert cache.get(1, make_tree(0, 1), 2, predict) == 3
+    assert len(cache) == 1
+    assert cache.hits == 1 and cache.misses == 3
+    assert cache.hit_rate() == 0.25
+
+
+if __name__ == "__main__":
+    test_signature_ignores_ids()
+    test_cache_hits_and_invalidates()
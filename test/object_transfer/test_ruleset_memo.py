@@ -0,0 +1,62 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Tests the memo of learned rulesets, on its own and when searching permutations
+"""
+
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from symbolic_stochastic_domains.ruleset_memo import RulesetMemo
+from test.simplicity_object_transfer.test_permutation_workers import make_problem
+from test.simplicity_object_transfer.simplest_explanation_based_object_transfer import \
+    get_object_permutation_rule_complexities
+
+
+def test_memo_evicts_by_size():
+    old_examples, old_ruleset, new_examples, _, _ = make_problem(0, 10)
+    examples = list(new_examples.examples.keys())
+
+    memo = RulesetMemo()
+    memo.add(examples[:1], 1, old_ruleset)
+    size = memo.size
+    assert size == 1 + sum(len(rule.context.nodes) for rule in old_ruleset.rules)
+
+    # Room for about two
+    memo = RulesetMemo(max_size=int(size * 2.5))
+    memo.add(examples[:1], 1, old_ruleset)
+    memo.add(examples[1:2], 2, old_ruleset)
+    assert memo.get(examples[:1]) == (1, old_ruleset)  # Now the most recently used
+    memo.add(examples[2:3], 3, old_ruleset)
+
+    assert len(memo) == 2
+    assert memo.get(examples[1:2]) is None
+    assert memo.get(examples[2:3])[0] == 3
+    assert memo.size <= memo.max_size
+
+    # Order matters, the learner sees them in that order
+    assert memo.get(examples[:2]) is None
+    memo.add(examples[:2], 4, old_ruleset)
+    assert memo.get(list(reversed(examples[:2]))) is None
+
+
+def test_search_reuses_rulesets():
+    old_examples, old_ruleset, new_examples, objects, names = make_problem(4, 25)
+    memo = RulesetMemo()
+
+    first = get_object_permutation_rule_complexities(
+        (names for _ in objects), old_ruleset, old_examples, new_examples, RulesetLearner(), objects, memo=memo
+    )
+    misses = memo.misses
+    assert misses > 0
+
+    # Nothing new, so nothing needs learning again
+    second = get_object_permutation_rule_complexities(
+        (names for _ in objects), old_ruleset, old_examples, new_examples, RulesetLearner(), objects, memo=memo
+    )
+    assert memo.misses == misses
+    assert first[0] == second[0]
+    assert [ruleset.rules_key() for ruleset in first[2]] == [ruleset.rules_key() for ruleset in second[2]]
+
+
+if __name__ == "__main__":
+    test_memo_evicts_by_size()
+    test_search_reuses_rulesets()
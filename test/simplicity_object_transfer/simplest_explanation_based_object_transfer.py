@@ -9,93 +9,458 @@ import pickle
 import random
 import numpy as np
 import itertools
-from typing import List
+import os
+import weakref
+import multiprocessing
+from typing import List, Dict, Optional
 
 from environment.symbolic_taxi import SymbolicTaxi
 from environment.symbolic_heist import SymbolicHeist
-from symbolic_stochastic_domains.symbolic_classes import Example, ExampleSet, Rule, RuleSet, DeicticReference, Outcome
+from symbolic_stochastic_domains.symbolic_classes import Example, ExampleSet, Rule, RuleSet, DeicticReference, Outcome, \
+    ExampleSetOverlay
 from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from symbolic_stochastic_domains.symbolic_utils import context_matches, covers
+from symbolic_stochastic_domains.ruleset_memo import RulesetMemo
+
+
+# Complexity given to permutations that contradict the previous examples
+CONTRADICTION = 1000
+
+
+def remap_example(example: Example, mapping: dict) -> Example:
+    # Replace objects referenced in outcome and literals with their new name
+    new_literals = example.state.copy_replace_names(mapping)
+
+    # Copy outcome but replace names. Has to be a cleaner way to do this.
+    # Problem is we only calculate the hash in the constructor
+    outcome = example.outcome
+    new_outcome = Outcome(
+        [DeicticReference(key.from_ob, key.edge_type, mapping[key.to_ob] if key.to_ob != '' else '', key.att_name, key.att_num)
+         for key in outcome.value.keys()],
+        list(outcome.value.values()),
+        outcome.no_effect)
+
+    # Create new example
+    return Example(example.action, new_literals, new_outcome)
+
+
+class ContradictionIndex:
+    """
+    The outcomes seen for each action and state (without object ids, so the same as comparing string_no_numbers),
+    so checking if an example contradicts is one lookup instead of comparing against every example.
+    Examples can be added on top of a parent index without changing it, for the examples remapped so far
+    """
+    def __init__(self, examples: ExampleSet = None, parent: "ContradictionIndex" = None):
+        self.parent = parent
+
+        # Key to one example for each different outcome seen with it
+        self.examples: Dict[tuple, List[Example]] = dict()
+
+        if examples is not None:
+            for example in examples.examples.keys():
+                self.add(example)
+
+    @staticmethod
+    def key(example: Example) -> tuple:
+        return example.action, example.state.base_object.string_no_numbers()
+
+    def add(self, example: Example, key: tuple = None):
+        seen = self.examples.setdefault(key or self.key(example), [])
+        if all(ex.outcome != example.outcome for ex in seen):
+            seen.append(example)
+
+    def find_contradiction(self, example: Example, key: tuple = None) -> Optional[Example]:
+        """An example with the same action and state, but a different outcome, if there is one"""
+        key = key or self.key(example)
+        index = self
+        while index is not None:
+            for ex in index.examples.get(key, []):
+                if example.outcome != ex.outcome:
+                    return ex
+            index = index.parent
+
+        return None
+
+    def contradicts(self, example: Example, mapping: dict) -> bool:
+        """Adds the example if it doesn't contradict anything"""
+        # TODO: What to do when there is a contradiction? Set to 0 probability?
+        # Check if there is a contradiction: We have experienced this exact set before but had a different outcome
+        key = self.key(example)
+        ex = self.find_contradiction(example, key)
+        if ex is not None:
+            print("Whoops, that's a contradiction!", example.state, ex.state, example.outcome, ex.outcome)
+            print(mapping)
+            return True
 
+        self.add(example, key)
+        return False
 
-def remap_examples(examples: ExampleSet, mapping: dict, previous_examples: ExampleSet) -> List[Example]:
-    new_example_list = []
-    for example in examples.examples.keys():
-        state = example.state
-        action = example.action
-        outcome = example.outcome
-
-        # Replace objects referenced in outcome and literals with their new name
-        new_literals = state.copy_replace_names(mapping)
-
-        # Copy outcome but replace names. Has to be a cleaner way to do this.
-        # Problem is we only calculate the hash in the constructor
-        new_outcome = Outcome(
-            [DeicticReference(key.from_ob, key.edge_type, mapping[key.to_ob] if key.to_ob != '' else '', key.att_name, key.att_num)
-             for key in outcome.value.keys()],
-            list(outcome.value.values()),
-            outcome.no_effect)
 
-        # Create new example
-        new_example = Example(example.action, new_literals, new_outcome)
+def remap_examples(examples: ExampleSet, mapping: dict, previous_examples: ExampleSet,
+                   index: ContradictionIndex = None) -> List[Example]:
+    """Pass the index of previous_examples if there is one already, otherwise it is made here"""
+    # Also need to check new examples as we begin remapping, so they go in their own layer
+    new_index = ContradictionIndex(parent=index or ContradictionIndex(previous_examples))
 
-        # TODO: need to somehow use hashing or some more effecient way of figuring this out
-        # TODO: What to do when there is a contradiction? Set to 0 probability?
-        # Check if there is a contradiction: We have experienced this exact set before but had a different outcome
-        for ex in previous_examples.examples:
-            if action == ex.action and new_outcome != ex.outcome and (new_literals.base_object.string_no_numbers() == ex.state.base_object.string_no_numbers()):
-                print("Whoops, that's a contradiction!", new_literals, ex.state, new_outcome, ex.outcome)
-                print(mapping)
-                return None
+    new_example_list = []
+    for example in examples.examples.keys():
+        new_example = remap_example(example, mapping)
 
-        # Also need to check new examples as we begin remapping!
-        for ex in new_example_list:
-            if action == ex.action and new_outcome != ex.outcome and (new_literals.base_object.string_no_numbers() == ex.state.base_object.string_no_numbers()):
-                print("Whoops, that's a contradiction!", new_literals, ex.state, new_outcome, ex.outcome)
-                print(mapping)
-                return None
+        if new_index.contradicts(new_example, mapping):
+            return None
 
         new_example_list.append(new_example)
 
     return new_example_list
 
 
-def get_object_permutation_rule_complexities(mappings_to_choose_from, old_ruleset, old_examples, new_examples, learner, objects):
-    permutations = itertools.product(*mappings_to_choose_from)
-    store_permutations = []
-    complexities = []
-    rulesets = []
+def example_objects(example: Example) -> set:
+    """Names of the objects an example needs mapped before it can be remapped (besides the taxi)"""
+    objects = {node.object_name for node in example.state.nodes}
+    objects.update(key.to_ob for key in example.outcome.value.keys() if key.to_ob != '')
+    objects.discard("taxi")
+    return objects
 
-    # Initial complexity of the ruleset
-    initial_complexity = sum([len(rule.context.nodes) for rule in old_ruleset.rules])
 
-    for permutation in permutations:
-        mapping = {state_object: permute_object for state_object, permute_object in zip(objects, permutation)}
-        mapping["taxi"] = "taxi"  # Taxi has to be there but always maps to itself
+def explained_by(ruleset: RuleSet, example: Example) -> bool:
+    """True if the ruleset already predicts the example's outcome, so learning it shouldn't need bigger rules"""
+    rules = [rule for rule in ruleset.rules if rule.action == example.action and context_matches(rule.context, example.state)]
 
-        remaped_examples = remap_examples(new_examples, mapping, old_examples)
+    # Nothing applies, so the default rule says nothing happens
+    if len(rules) == 0:
+        return example.outcome.no_effect
 
-        # Indicates a contradiction in the mapping. Indicate this with a huge complexity, and move on
-        if remaped_examples is None:
-            complexities.append(1000)
-            store_permutations.append(permutation)
-            rulesets.append(None)
-            continue
+    return any(covers(outcome, example) for rule in rules for outcome in rule.outcomes.outcomes)
+
+
+def outcome_shape(outcome: Outcome) -> tuple:
+    """What is left of an outcome once the object names are taken out. Remapping an outcome can't change this"""
+    return tuple(sorted((str(key.edge_type), key.att_name, str(value)) for key, value in outcome.value.items()))
 
-        print(mapping)
-        # Add the examples, learn the new ruleset, then remove the example for the next
-        old_examples.add_examples(remaped_examples)
-        new_ruleset = learner.learn_ruleset(old_examples)
-        old_examples.remove_examples(remaped_examples)
 
-        # TODO: Needs to take into account properties
-        complexity = sum([len(rule.context.nodes) for rule in new_ruleset.rules])
-        complexity = complexity - initial_complexity
+def learn_complexity(remaped_examples: List[Example], old_examples: ExampleSet, learner: RulesetLearner,
+                     initial_complexity: int, warm_start: RuleSet = None):
+    """
+    Complexity the remapped examples add to the ruleset, and the ruleset.
+    warm_start is what the learner learns from old_examples alone. If given, only the outcomes the remapped
+    examples change are relearned
+    """
+    # Learn with the examples added on top of the old ones. The old ones aren't touched, so they can be shared
+    examples = ExampleSetOverlay(old_examples)
+    examples.add_examples(remaped_examples)
+    if warm_start is not None:
+        new_ruleset, _ = learner.learn_ruleset_delta(warm_start, old_examples, examples, remaped_examples)
+    else:
+        new_ruleset = learner.learn_ruleset(examples)
+
+    # TODO: Needs to take into account properties
+    complexity = sum([len(rule.context.nodes) for rule in new_ruleset.rules])
+    complexity = complexity - initial_complexity
+
+    return complexity, new_ruleset
+
+
+def evaluate_permutation(permutation, objects, old_examples: ExampleSet, new_examples: ExampleSet,
+                         learner: RulesetLearner, initial_complexity: int, index: ContradictionIndex = None,
+                         warm_start: RuleSet = None):
+    """Learns the ruleset for one permutation. Returns its complexity and the ruleset, or 1000 and None for a contradiction"""
+    mapping = {state_object: permute_object for state_object, permute_object in zip(objects, permutation)}
+    mapping["taxi"] = "taxi"  # Taxi has to be there but always maps to itself
+
+    remaped_examples = remap_examples(new_examples, mapping, old_examples, index)
+
+    # Indicates a contradiction in the mapping. Indicate this with a huge complexity, and move on
+    if remaped_examples is None:
+        return CONTRADICTION, None
+
+    print(mapping)
+    return learn_complexity(remaped_examples, old_examples, learner, initial_complexity, warm_start)
+
+
+# What each worker process needs to evaluate permutations, sent once when the pool starts. See init_worker
+WORKER = dict()
+
+
+def init_worker(old_ruleset: RuleSet, old_examples: ExampleSet):
+    # Copy so hashes are updated, in case the worker has a different hash seed
+    WORKER["old_examples"] = old_examples.copy()
+    WORKER["index"] = ContradictionIndex(WORKER["old_examples"])
+    WORKER["initial_complexity"] = sum([len(rule.context.nodes) for rule in old_ruleset.rules])
+    WORKER["learner"] = RulesetLearner()
+    WORKER["warm_start"] = WORKER["learner"].learn_ruleset(WORKER["old_examples"])
+
+
+def evaluate_chunk(data):
+    permutations, objects, new_examples = data
+    new_examples = new_examples.copy()
+    return [evaluate_permutation(permutation, objects, WORKER["old_examples"], new_examples, WORKER["learner"],
+                                 WORKER["initial_complexity"], WORKER["index"], WORKER["warm_start"])
+            for permutation in permutations]
+
+
+def default_num_workers() -> int:
+    """One worker per CPU, except inside another pool's worker (like the runners' experiments), which can't have any"""
+    if multiprocessing.current_process().daemon:
+        return 1
+    return os.cpu_count() or 1
+
+
+class PermutationWorkers:
+    """
+    Process pool for learning the rulesets of permutations in parallel, because every permutation is independent.
+    The prior examples are big and don't change, so they are sent to each worker once, when the pool is made.
+    Results come back in the same order as the permutations. Can't be used from inside another pool's worker
+    (like the runners' experiments), because those aren't allowed to have children.
+    Call close when done with it. If nobody does, the processes are terminated when it gets garbage collected or at exit.
+    Workers started with spawn have their own hash seed, which is fine because the learner sorts the object names
+    """
+    def __init__(self, num_workers: int, old_ruleset: RuleSet, old_examples: ExampleSet, chunk_size: int = 4,
+                 start_method: str = None):
+        self.num_workers = num_workers
+        self.chunk_size = chunk_size
+        self.old_ruleset = old_ruleset
+        self.old_examples = old_examples
+        context = multiprocessing.get_context(start_method)
+        self.pool = context.Pool(num_workers, initializer=init_worker, initargs=(old_ruleset, old_examples))
+        self.finalizer = weakref.finalize(self, self.pool.terminate)
+
+    def evaluate(self, permutations: list, objects, new_examples: ExampleSet) -> list:
+        """(complexity, ruleset) for each permutation"""
+        chunks = [(permutations[i:i + self.chunk_size], objects, new_examples)
+                  for i in range(0, len(permutations), self.chunk_size)]
+
+        results = []
+        for chunk_results in self.pool.map(evaluate_chunk, chunks):
+            for complexity, ruleset in chunk_results:
+                # Copy so hashes are updated for this process
+                results.append((complexity, ruleset.copy() if ruleset is not None else None))
+
+        return results
+
+    def close(self):
+        # Only terminates the pool the first time
+        self.finalizer()
+
+
+def get_object_permutation_rule_complexities(mappings_to_choose_from, old_ruleset, old_examples, new_examples, learner,
+                                             objects, workers: PermutationWorkers = None,
+                                             index: ContradictionIndex = None, memo: RulesetMemo = None,
+                                             warm_start: RuleSet = None):
+    """
+    Finds the complexity of the ruleset for every permutation of the unknown objects, returned in itertools.product order.
+    Only the permutations with the lowest complexity matter, so this is a branch and bound over partial assignments
+    instead of learning a ruleset for every one:
+    Each example gets remapped as soon as all of its objects are assigned, and if it contradicts the previous examples
+    every permutation under that assignment is a contradiction, without remapping or learning any of them.
+    Assignments are tried identity first (unknown maps to the known with the same name), then ones whose examples the
+    old ruleset already explains, so the best complexity is found early.
+
+    Every partial assignment also gets a lower bound on the complexity of anything under it (see lower_bound), and once
+    something beats that bound, its subtree is skipped and every permutation in it gets the bound as its complexity
+    (with no ruleset). Ties aren't skipped, because every permutation tied for the lowest complexity is kept, so the
+    skipped ones never have the lowest complexity.
+
+    If workers are given, the permutations that are left are learned in parallel with them, in batches so the bound
+    still gets updated. The workers must have been made with the same old ruleset and examples.
+    The old examples don't change between calls, so pass their ContradictionIndex to save rebuilding it, and a
+    RulesetMemo (for these old examples only) to reuse rulesets already learned for the same remapped examples.
+    Pass the ruleset the learner gets from the old examples alone as warm_start to only relearn the outcomes each
+    permutation changes (see RulesetLearner.learn_ruleset_delta). Workers always do this
+    """
+    objects = list(objects)
+    options = [list(choices) for choices in mappings_to_choose_from]
+    permutations = list(itertools.product(*options))
 
-        complexities.append(complexity)
-        store_permutations.append(permutation)
-        rulesets.append(new_ruleset)
+    # Initial complexity of the ruleset
+    initial_complexity = sum([len(rule.context.nodes) for rule in old_ruleset.rules])
 
-    return complexities, store_permutations, rulesets
+    if workers is not None:
+        assert workers.old_examples is old_examples and workers.old_ruleset is old_ruleset, "Workers have other examples"
+
+    # Examples can be remapped once the last of their objects is assigned. Keep their order, the learner cares
+    depth_of = {unknown: i for i, unknown in enumerate(objects)}
+    examples_at_depth = [[] for _ in range(len(objects) + 1)]
+    for i, example in enumerate(new_examples.examples.keys()):
+        depth = max([depth_of[unknown] + 1 for unknown in example_objects(example)], default=0)
+        examples_at_depth[depth].append((i, example))
+
+    if index is None:
+        index = ContradictionIndex(old_examples)
+
+    # For the lower bound. What the old examples learn on their own, by outcome. The learner does the same for any
+    # outcome whose examples don't change, as long as the object names don't either (see learn_ruleset_delta)
+    if warm_start is None:
+        warm_start = RulesetLearner().learn_ruleset(old_examples)
+    warm_sizes, warm_actions = dict(), dict()
+    for rule in warm_start.rules:
+        outcome = rule.outcomes.outcomes[0]
+        warm_sizes[outcome] = warm_sizes.get(outcome, 0) + len(rule.context.nodes)
+        warm_actions[outcome] = rule.action
+
+    # Every outcome gets at least one rule, and rules only ever grow from the contexts the learner starts them with.
+    # If an example with the same action but another outcome matches all of those, the rule has to add at least
+    # one literal to leave it out, and every literal adds a node. More examples can only make that more true
+    starting_contexts = dict()
+    blocked = dict()  # (outcome, example) to if the example is one of those
+
+    def blocks(outcome, action, example):
+        if (outcome, example) not in blocked:
+            if outcome not in starting_contexts:
+                starting_contexts[outcome] = learner.initialize_deictic_rules(outcome)
+            blocked[(outcome, example)] = example.action == action and example.outcome != outcome and \
+                all(context_matches(context, example.state) for context in starting_contexts[outcome])
+        return blocked[(outcome, example)]
+
+    old_blocked = dict()
+
+    def min_size(outcome, action, remaped):
+        if (outcome, action) not in old_blocked:
+            old_blocked[(outcome, action)] = any(blocks(outcome, action, ex) for ex in old_examples.examples.keys())
+        size = len(starting_contexts[outcome][0].nodes)
+        if old_blocked[(outcome, action)] or any(blocks(outcome, action, ex) for _, ex in remaped):
+            size += 1
+        return size
+
+    # The names stay the same if nothing can be mapped to a name the old examples don't have
+    old_names = set(old_examples.referenced_object_names())
+    options_fixed = [all(set(choices) <= old_names for choices in options[depth:]) for depth in range(len(objects) + 1)]
+
+    # What the examples that aren't remapped yet could touch: their actions, and their outcomes under any mapping
+    future_actions = [set() for _ in range(len(objects) + 1)]
+    future_shapes = [set() for _ in range(len(objects) + 1)]
+    for depth in reversed(range(len(objects))):
+        future_actions[depth] = future_actions[depth + 1] | {ex.action for _, ex in examples_at_depth[depth + 1]}
+        future_shapes[depth] = future_shapes[depth + 1] | {outcome_shape(ex.outcome) for _, ex in examples_at_depth[depth + 1]}
+
+    def lower_bound(depth, mapping, remaped):
+        """
+        Lowest complexity any permutation starting with the first depth objects assigned by mapping could have.
+        Outcomes the examples can't change keep their rules from warm_start. Every other outcome gets
+        at least the smallest rule it could have (see min_size). Greedy FOIL can find smaller rules with more examples,
+        so the rules learned for only the examples so far can't be used for a bound
+        """
+        names_fixed = options_fixed[depth] and all(mapping[unknown] in old_names for unknown in objects[:depth])
+
+        actions = dict(warm_actions)  # Outcome to the action the learner would give its rules
+        touched = set()
+        touched_actions = set()
+        for _, example in remaped:
+            touched_actions.add(example.action)
+            if not example.outcome.is_no_effect():
+                actions.setdefault(example.outcome, example.action)
+                touched.add(example.outcome)
+
+        bound = 0
+        for outcome, action in actions.items():
+            if names_fixed and outcome in warm_sizes and outcome not in touched and action not in touched_actions and \
+                    action not in future_actions[depth] and outcome_shape(outcome) not in future_shapes[depth]:
+                bound += warm_sizes[outcome]
+            else:
+                bound += min_size(outcome, action, remaped)
+
+        return bound - initial_complexity
+
+    results = dict()  # Permutation to (complexity, ruleset)
+    best = [None]  # Lowest complexity learned so far
+
+    def fill(prefix, complexity):
+        # Every permutation starting with prefix gets this complexity
+        for rest in itertools.product(*options[len(prefix):]):
+            results[prefix + rest] = (complexity, None)
+
+    def assign(depth, mapping, remaped, parent_index):
+        """
+        Remaps the examples completed at depth. Returns all the remapped examples so far (None for a contradiction),
+        the index with them, and if any of the new ones are unexplained (those are tried last)
+        """
+        child_index = ContradictionIndex(parent=parent_index)
+        new_remaped = []
+        grows = False
+        for i, example in examples_at_depth[depth]:
+            new_example = remap_example(example, mapping)
+            if child_index.contradicts(new_example, mapping):
+                return None, child_index, grows
+            grows = grows or not explained_by(old_ruleset, new_example)
+            new_remaped.append((i, new_example))
+
+        return remaped + new_remaped, child_index, grows
+
+    def candidates(prefix, mapping, remaped, remaped_index):
+        """Generates the permutations that still need learning, in the order they should be tried"""
+        depth = len(prefix)
+
+        if best[0] is not None:
+            bound = lower_bound(depth, mapping, remaped)
+            if bound > best[0]:
+                fill(prefix, bound)
+                return
+
+        if depth == len(objects):
+            yield prefix, mapping, [ex for _, ex in sorted(remaped, key=lambda pair: pair[0])]
+            return
+
+        unknown = objects[depth]
+        children = []
+        for i, known in enumerate(options[depth]):
+            child_mapping = {**mapping, unknown: known}
+            child_remaped, child_index, child_grows = assign(depth + 1, child_mapping, remaped, remaped_index)
+
+            if child_remaped is None:
+                fill(prefix + (known,), CONTRADICTION)
+                continue
+
+            children.append(((child_grows, known != unknown, i), known, child_mapping, child_remaped, child_index))
+
+        children.sort(key=lambda child: child[0])
+        for _, known, child_mapping, child_remaped, child_index in children:
+            yield from candidates(prefix + (known,), child_mapping, child_remaped, child_index)
+
+    def update(permutation, complexity, ruleset):
+        results[permutation] = (complexity, ruleset)
+        if best[0] is None or complexity < best[0]:
+            best[0] = complexity
+
+    # Taxi has to be there but always maps to itself
+    root_remaped, root_index, _ = assign(0, {"taxi": "taxi"}, [], index)
+    if root_remaped is None:
+        fill((), CONTRADICTION)
+    elif workers is None:
+        for permutation, mapping, remaped in candidates((), {"taxi": "taxi"}, root_remaped, root_index):
+            result = memo.get(remaped) if memo is not None else None
+            if result is None:
+                print(mapping)
+                result = learn_complexity(remaped, old_examples, learner, initial_complexity, warm_start)
+                if memo is not None:
+                    memo.add(remaped, *result)
+
+            update(permutation, *result)
+    else:
+        batch_size = workers.num_workers * workers.chunk_size
+        remaining = candidates((), {"taxi": "taxi"}, root_remaped, root_index)
+        while True:
+            batch = list(itertools.islice(remaining, batch_size))
+            if len(batch) == 0:
+                break
+
+            # Only send the ones that haven't been learned before
+            to_learn = []
+            for permutation, _, remaped in batch:
+                result = memo.get(remaped) if memo is not None else None
+                if result is None:
+                    to_learn.append((permutation, remaped))
+                else:
+                    update(permutation, *result)
+
+            learned = workers.evaluate([permutation for permutation, _ in to_learn], objects, new_examples)
+            for (permutation, remaped), result in zip(to_learn, learned):
+                if memo is not None:
+                    memo.add(remaped, *result)
+                update(permutation, *result)
+
+    complexities = [results[permutation][0] for permutation in permutations]
+    rulesets = [results[permutation][1] for permutation in permutations]
+
+    return complexities, permutations, rulesets
 
 
 def main():
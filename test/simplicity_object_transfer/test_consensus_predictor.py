@@ -0,0 +1,77 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Predicting with only the distinct hypotheses in the best rulesets should agree with checking every permutation
+"""
+
+import random
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
+from algorithm.symbolic_domains.simplest_explanation_model import SimplestExplanationModel
+from symbolic_stochastic_domains.object_transfer import determine_transition_given_action_2
+from test.test_incremental_learning import run_random_steps
+
+
+def every_permutation(model, action, literals):
+    # How the model used to predict, one permutation at a time
+    outcomes = []
+    for permutation, (ruleset, seen_objects) in model.best_rulesets.items():
+        object_map = {key: value.copy() for key, value in model.object_map.items()}
+        for seen_object, permute_object in zip(seen_objects, permutation):
+            object_map[seen_object] = [permute_object]
+        outcomes.append(determine_transition_given_action_2(action, object_map, ruleset, literals))
+
+    if all(outcome is not None and list(outcome.value.values()) == list(outcomes[0].value.values())
+           for outcome in outcomes):
+        return outcomes[0]
+    return None
+
+
+def check_predictions(model, env):
+    for state in list(env.get_literals_cache().keys())[:50]:
+        literals, _ = env.get_literals(state)
+        for action in range(env.get_num_actions()):
+            expected = every_permutation(model, action, literals)
+            outcomes = model.get_outcomes_using_rulesets(state, action, literals)
+            if expected is None:
+                assert outcomes is None
+            else:
+                assert len(outcomes) == 1 and str(outcomes[0]) == str(expected)
+
+
+def test_hypotheses_match_every_permutation():
+    random.seed(3)
+    np.random.seed(3)
+    env = SymbolicHeist(stochastic=False)
+    prior = SymbolicModel(env)
+    run_random_steps(env, prior, 300)
+
+    env = SymbolicHeist(stochastic=False, shuffle_object_names=True)
+    model = SimplestExplanationModel(env, prior.ruleset.copy(), prior.examples.copy(), prior.experience_helper)
+
+    env.restart()
+    num_actions = env.get_num_actions()
+    for _ in range(8):
+        action = random.randint(0, num_actions - 1)
+        curr_state = env.get_state()
+        _, observation, _ = env.step(action)
+        model.add_experience(action, curr_state, observation)
+
+        assert len(model.hypotheses()) <= len(model.best_rulesets)
+
+        check_predictions(model, env)
+
+    # Permutations that only differ by knowns the rules never mention are the same hypothesis
+    ruleset, _ = next(iter(model.best_rulesets.values()))
+    unknown = next(iter(model.object_map.keys()))
+    model.best_rulesets = {(known,): (ruleset, [unknown]) for known in ["wall", "not_in_rules", "also_not_in_rules"]}
+    model.version += 1
+    assert len(model.hypotheses()) == 2
+    check_predictions(model, env)
+
+
+if __name__ == "__main__":
+    test_hypotheses_match_every_permutation()
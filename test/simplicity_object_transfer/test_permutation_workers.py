@@ -0,0 +1,127 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Searching the permutations (serially, or in worker processes) should give the same best results as learning every
+one of them, in the same order
+"""
+
+import itertools
+import random
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from test.simplicity_object_transfer.simplest_explanation_based_object_transfer import \
+    get_object_permutation_rule_complexities, PermutationWorkers, evaluate_permutation, ContradictionIndex, CONTRADICTION
+from test.test_context_matcher import collect_examples
+
+
+def make_problem(seed, new_steps):
+    random.seed(seed)
+    np.random.seed(seed)
+
+    old_examples = collect_examples(SymbolicHeist(stochastic=False), 60)
+    old_ruleset = RulesetLearner().learn_ruleset(old_examples)
+
+    new_examples = collect_examples(SymbolicHeist(stochastic=False, shuffle_object_names=True), new_steps)
+    objects = new_examples.referenced_object_names()
+    names = old_examples.referenced_object_names()
+
+    return old_examples, old_ruleset, new_examples, objects, names
+
+
+def test_search_matches_brute_force():
+    pruned = 0
+    for seed, new_steps in [(0, 10), (4, 25), (5, 25)]:
+        old_examples, old_ruleset, new_examples, objects, names = make_problem(seed, new_steps)
+        initial_complexity = sum([len(rule.context.nodes) for rule in old_ruleset.rules])
+
+        expected = [evaluate_permutation(permutation, objects, old_examples, new_examples, RulesetLearner(), initial_complexity)
+                    for permutation in itertools.product(*(names for _ in objects))]
+
+        complexities, permutations, rulesets = get_object_permutation_rule_complexities(
+            (names for _ in objects), old_ruleset, old_examples, new_examples, RulesetLearner(), objects
+        )
+        assert permutations == list(itertools.product(*(names for _ in objects)))
+
+        # The best ones are all there, with the same rules
+        lowest = min(complexity for complexity, _ in expected)
+        best = [i for i, (complexity, _) in enumerate(expected) if complexity == lowest]
+        assert best == [i for i, complexity in enumerate(complexities) if complexity == min(complexities)]
+        assert [expected[i][1].rules_key() for i in best] == [rulesets[i].rules_key() for i in best]
+
+        # Everything else is either learned, or skipped with a bound that really is lower and still worse than the best
+        for complexity, ruleset, (expected_complexity, _) in zip(complexities, rulesets, expected):
+            if ruleset is None and expected_complexity != CONTRADICTION:
+                assert lowest < complexity <= expected_complexity
+                pruned += 1
+            else:
+                assert complexity == expected_complexity
+
+    assert pruned > 0
+
+
+def test_contradiction_index_matches_scan():
+    random.seed(3)
+    np.random.seed(3)
+
+    # Stochastic, so there are some real contradictions
+    examples = collect_examples(SymbolicHeist(stochastic=True), 300)
+    others = collect_examples(SymbolicHeist(stochastic=True), 300)
+    index = ContradictionIndex(examples)
+
+    pairs = []
+    for example in others.examples.keys():
+        expected = any(example.action == ex.action and example.outcome != ex.outcome and
+                       example.state.base_object.string_no_numbers() == ex.state.base_object.string_no_numbers()
+                       for ex in examples.examples)
+        contradiction = index.find_contradiction(example)
+        assert (contradiction is not None) == expected
+        if expected:
+            pairs.append((example, contradiction))
+
+    assert len(pairs) > 0
+
+    # A layer on top sees its parent, but the parent doesn't see it
+    example, contradiction = pairs[0]
+    parent = ContradictionIndex()
+    layer = ContradictionIndex(parent=parent)
+    assert not layer.contradicts(example, {})  # Gets added to the layer
+    assert parent.find_contradiction(contradiction) is None
+    assert layer.find_contradiction(contradiction) is example
+
+    parent.add(contradiction)
+    assert ContradictionIndex(parent=parent).contradicts(example, {})
+
+
+def test_workers_match_serial():
+    old_examples, old_ruleset, new_examples, objects, names = make_problem(0, 3)
+
+    serial = get_object_permutation_rule_complexities(
+        (names for _ in objects), old_ruleset, old_examples, new_examples, RulesetLearner(), objects
+    )
+
+    # Spawned workers have a different hash seed, and still have to learn the same rules
+    for start_method in [None, "spawn"]:
+        workers = PermutationWorkers(2, old_ruleset, old_examples, chunk_size=3, start_method=start_method)
+        try:
+            parallel = get_object_permutation_rule_complexities(
+                (names for _ in objects), old_ruleset, old_examples, new_examples, RulesetLearner(), objects,
+                workers=workers
+            )
+        finally:
+            workers.close()
+
+        assert not workers.finalizer.alive
+
+        assert serial[0] == parallel[0]
+        assert serial[1] == parallel[1]
+        assert [ruleset.rules_key() if ruleset is not None else None for ruleset in serial[2]] == \
+               [ruleset.rules_key() if ruleset is not None else None for ruleset in parallel[2]]
+
+
+if __name__ == "__main__":
+    test_search_matches_brute_force()
+    test_contradiction_index_matches_scan()
+    test_workers_match_serial()
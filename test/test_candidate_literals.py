@@ -0,0 +1,57 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the uncopied candidate literals are the same as the trees the learner used to copy out for each one
+"""
+
+import random
+import numpy as np
+
+from environment.prison_world import Prison
+from symbolic_stochastic_domains.candidate_literals import CandidateLiteralCache
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from symbolic_stochastic_domains.predicate_tree import PredicateTree
+from test.test_context_matcher import collect_examples
+
+
+def test_candidate_literals_match_copies():
+    random.seed(3)
+    np.random.seed(3)
+    examples = collect_examples(Prison(stochastic=False), 1000)
+
+    learner = RulesetLearner()
+    learner.literal_cache = CandidateLiteralCache(max_size=5)
+    ruleset = learner.learn_ruleset(examples)
+
+    for rule in ruleset.rules:
+        for candidate in learner.candidate_literals(rule.context):
+            tree = candidate.to_context()
+            assert candidate.compile_context() == tree.compile_context(), str(tree)
+
+            # The base context shouldn't have been touched
+            assert str(rule.context) != str(tree)
+
+    assert learner.literal_cache.hits > 0 and learner.literal_cache.misses > 0
+    assert len(learner.literal_cache) <= 5
+
+
+def test_candidate_literal_cache_hits():
+    learner = RulesetLearner()
+    learner.literal_cache = CandidateLiteralCache()
+    learner.object_names = {"wall", "lock", "key"}
+
+    base = PredicateTree()
+    base.add_node("taxi0")
+    tree = learner.candidate_literals(base)[0].to_context()
+
+    # A copy of the same context should hit the cache and give the same literals
+    first = [str(candidate.to_context()) for candidate in learner.candidate_literals(tree)]
+    second = [str(candidate.to_context()) for candidate in learner.candidate_literals(tree.copy())]
+
+    assert first == second
+    assert learner.literal_cache.misses == 2 and learner.literal_cache.hits == 1
+
+
+if __name__ == "__main__":
+    test_candidate_literals_match_copies()
+    test_candidate_literal_cache_hits()
@@ -0,0 +1,88 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Verifies the compiled bitmask context matching gives exactly the same answers as Node.contains
+"""
+
+import random
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from environment.prison_world import Prison
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from symbolic_stochastic_domains.coverage_matrix import CoverageMatrix
+from symbolic_stochastic_domains.symbolic_classes import ExampleSet, Example
+from symbolic_stochastic_domains.symbolic_utils import context_matches
+
+
+def collect_examples(env, steps):
+    examples = ExampleSet()
+    for _ in range(steps):
+        action = random.randint(0, env.get_num_actions() - 1)
+        literals, outcome, _ = env.step(action)
+        examples.add_example(Example(action, literals, outcome))
+
+        if env.end_of_episode():
+            env.restart()
+
+    return examples
+
+
+def candidate_contexts(examples):
+    """Every context the learner would try, one and two literals deep, plus the learned rules"""
+    learner = RulesetLearner()
+    ruleset = learner.learn_ruleset(examples)
+    contexts = [rule.context for rule in ruleset.rules]
+
+    for outcome in learner.find_unique_outcomes(examples):
+        for context in learner.initialize_deictic_rules(outcome):
+            contexts.append(context)
+            for new_context in learner.create_new_contexts_from_context(context):
+                contexts.append(new_context)
+                contexts.extend(learner.create_new_contexts_from_context(new_context)[:10])
+
+    return contexts
+
+
+def check_matches_contains(env):
+    examples = collect_examples(env, 2000)
+    contexts = candidate_contexts(examples)
+
+    for context in contexts:
+        for example in examples.examples:
+            expected = example.state.base_object.contains(context.base_object)
+            assert context_matches(context, example.state) == expected, f"{context} {example.state}"
+
+
+def test_coverage_matrix_matches_context_matches():
+    random.seed(2)
+    np.random.seed(2)
+    env = Prison(stochastic=False)
+    examples = collect_examples(env, 1000)
+    contexts = candidate_contexts(examples)
+
+    coverage = CoverageMatrix(examples)
+    all_examples = list(examples.examples.keys())
+    covered = coverage.coverage(contexts, coverage.rows(all_examples))
+
+    for i, example in enumerate(all_examples):
+        for j, context in enumerate(contexts):
+            assert covered[i, j] == context_matches(context, example.state), f"{context} {example.state}"
+
+
+def test_heist_context_matching():
+    random.seed(1)
+    np.random.seed(1)
+    check_matches_contains(SymbolicHeist(stochastic=False))
+
+
+def test_prison_context_matching():
+    random.seed(1)
+    np.random.seed(1)
+    check_matches_contains(Prison(stochastic=False))
+
+
+if __name__ == "__main__":
+    test_heist_context_matching()
+    test_prison_context_matching()
+    test_coverage_matrix_matches_context_matches()
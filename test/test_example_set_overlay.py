@@ -0,0 +1,49 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+An overlay on an ExampleSet should act just like a copy of it that had the same changes made
+"""
+
+import random
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from symbolic_stochastic_domains.symbolic_classes import ExampleSet, ExampleSetOverlay
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from test.test_context_matcher import collect_examples
+
+
+def test_overlay_matches_copy():
+    random.seed(0)
+    np.random.seed(0)
+    env = SymbolicHeist(stochastic=False)
+
+    base = collect_examples(env, 200)
+    before = list(base.examples.items())
+
+    extra = list(collect_examples(env, 40).examples.keys())
+    # Some go away completely, others just have their count drop
+    once = [example for example, count in base.examples.items() if count == 1 and example not in extra]
+    removed = once[:2] + [example for example, count in base.examples.items() if count > 1][:3] + [extra[0]]
+
+    copy = ExampleSet()
+    copy.examples = dict(base.examples)
+    overlay = ExampleSetOverlay(base)
+    for examples in [copy, overlay]:
+        examples.add_examples(extra)
+        examples.remove_examples(removed)
+
+    assert list(overlay.examples.items()) == list(copy.examples.items())
+    assert len(overlay.examples) == len(copy.examples)
+    assert all(example in overlay.examples for example in copy.examples)
+    assert once[0] not in overlay.examples and once[0] in base.examples
+
+    # The base never changed
+    assert list(base.examples.items()) == before
+
+    assert str(RulesetLearner().learn_ruleset(overlay)) == str(RulesetLearner().learn_ruleset(copy))
+
+
+if __name__ == "__main__":
+    test_overlay_matches_copy()
@@ -4,10 +4,41 @@ Created on 10/22/22 by Ethan Frank
 Tests for experience_helper.py.
 """
 
+import pickle
+import random
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
 from symbolic_stochastic_domains.experience_helper import ExperienceHelper
 from symbolic_stochastic_domains.predicate_tree import PredicateTree
 from symbolic_stochastic_domains.predicates_and_objects import PredicateType
 from symbolic_stochastic_domains.symbolic_classes import Example
+from test.test_incremental_learning import run_random_steps
+
+
+def test_novel_actions_match_experience_dicts():
+    random.seed(4)
+    np.random.seed(4)
+    env = SymbolicHeist(stochastic=False)
+    model = SymbolicModel(env, incremental=True)
+    run_random_steps(env, model, 300)
+
+    # The index rebuilt from a pickle or copy has to agree too
+    helpers = [model.experience_helper, model.experience_helper.copy(), pickle.loads(pickle.dumps(model.experience_helper))]
+
+    for state in list(env.get_literals_cache()):
+        literals, _ = env.get_literals(state)
+        for n in [1, 2]:
+            experiences = model.experience_helper.experiences[n-1]
+            expected = [
+                any(experience not in experiences or action not in experiences[experience]
+                    for experience in ExperienceHelper.extract_experiences(literals, n))
+                for action in range(env.get_num_actions())
+            ]
+            for helper in helpers:
+                assert helper.novel_actions(literals, n, env.get_num_actions()) == expected
+
 
 if __name__ == "__main__":
     # The current state
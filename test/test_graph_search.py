@@ -0,0 +1,37 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the shared breadth first search finds shortest paths and resets properly between searches
+"""
+
+from policy.graph_search import BreadthFirstSearch
+
+
+def search(bfs, graph, start, goal):
+    """graph is state: list of next states, one per action"""
+    bfs.start(start)
+    while bfs.has_next():
+        state = bfs.pop()
+        for action, next_state in enumerate(graph[state]):
+            if bfs.is_new(next_state):
+                bfs.add(next_state, state, action)
+                if next_state == goal:
+                    return bfs.get_path(next_state)
+
+    return []
+
+
+def test_breadth_first_search():
+    # 0 -> 1 -> 2 -> 4 is long, 0 -> 3 -> 4 is short
+    graph = {0: [1, 3], 1: [2, 0], 2: [4, 1], 3: [0, 4], 4: [4, 4]}
+    bfs = BreadthFirstSearch(5)
+
+    # The path is in reverse order
+    assert search(bfs, graph, 0, 4) == [1, 1]
+    assert search(bfs, graph, 4, 0) == []
+    assert search(bfs, graph, 1, 3) == [1, 1]
+    assert search(bfs, graph, 0, 0) == []
+
+
+if __name__ == "__main__":
+    test_breadth_first_search()
@@ -0,0 +1,142 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks that incremental ruleset learning in SymbolicModel gives the same rules as a full relearn, and that relearning only the outcomes some new examples change gives the same rules as learning everything again
+"""
+
+import random
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from environment.prison_world import Prison
+from environment.symbolic_taxi import SymbolicTaxi
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
+from symbolic_stochastic_domains.learn_ruleset_outcomes import RulesetLearner
+from symbolic_stochastic_domains.symbolic_classes import ExampleSet, ExampleSetOverlay
+
+
+def run_random_steps(env, model, steps):
+    for _ in range(steps):
+        action = random.randint(0, env.get_num_actions() - 1)
+        curr_state = env.get_state()
+        _, observation, _ = env.step(action)
+        model.add_experience(action, curr_state, observation)
+
+        if env.end_of_episode():
+            env.restart()
+
+
+def check_matches_full_relearn(env):
+    incremental_model = SymbolicModel(env, incremental=True)
+
+    # Not just the examples it has seen, the rules have to be the same to predict unseen states the same way.
+    # Check every step, repeated examples and ones it already predicts change the rules too
+    for _ in range(200):
+        run_random_steps(env, incremental_model, 1)
+        expected = RulesetLearner().learn_ruleset(incremental_model.examples)
+        assert incremental_model.ruleset.rules_key() == expected.rules_key()
+
+    run_random_steps(env, incremental_model, 300)
+
+    full_model = SymbolicModel(env)
+    full_model.ruleset = RulesetLearner().learn_ruleset(incremental_model.examples)
+    assert incremental_model.ruleset.rules_key() == full_model.ruleset.rules_key()
+
+    for example in incremental_model.examples.examples:
+        assert incremental_model.predict_outcome(example.state, example.action) == example.outcome
+        assert full_model.predict_outcome(example.state, example.action) == example.outcome
+
+
+def test_incremental_heist():
+    random.seed(0)
+    np.random.seed(0)
+    check_matches_full_relearn(SymbolicHeist(stochastic=False))
+
+
+def test_incremental_prison():
+    random.seed(4)
+    np.random.seed(4)
+    check_matches_full_relearn(Prison(stochastic=False))
+
+
+def test_first_example_without_objects():
+    random.seed(0)
+    np.random.seed(0)
+
+    for env in [SymbolicTaxi(stochastic=False), Prison(stochastic=False)]:
+        model = SymbolicModel(env, incremental=True)
+
+        # Look for something that happens when the taxi isn't touching anything, and learn from that first
+        while True:
+            action = random.randint(0, env.get_num_actions() - 1)
+            curr_state = env.get_state()
+            _, observation, _ = env.step(action)
+            literals, _ = env.get_literals(curr_state)
+            if len(literals.referenced_objects) == 0 and not observation.is_no_effect():
+                break
+
+            if env.end_of_episode():
+                env.restart()
+
+        model.add_experience(action, curr_state, observation)
+        assert model.examples.referenced_object_names() == []
+
+        for _ in range(20):
+            run_random_steps(env, model, 1)
+            assert model.ruleset.rules_key() == RulesetLearner().learn_ruleset(model.examples).rules_key()
+
+
+def test_version_only_changes_with_rules():
+    random.seed(2)
+    np.random.seed(2)
+    env = SymbolicHeist(stochastic=False)
+    model = SymbolicModel(env)
+
+    versions = 0
+    for _ in range(100):
+        last_rules, last_version = model.ruleset.rules_key(), model.version
+        run_random_steps(env, model, 1)
+        assert (model.version != last_version) == (model.ruleset.rules_key() != last_rules)
+        versions += model.version != last_version
+
+    assert 0 < versions < 100
+
+
+def test_delta_relearn_matches_full():
+    random.seed(3)
+    np.random.seed(3)
+
+    for env in [SymbolicHeist(stochastic=False), Prison(stochastic=False)]:
+        model = SymbolicModel(env)
+        run_random_steps(env, model, 500)
+
+        examples = list(model.examples.examples.keys())
+        previous_examples = ExampleSet()
+        previous_examples.examples = {example: count for example, count in model.examples.examples.items()
+                                      if random.random() < 0.8}
+        others = [example for example in examples if example not in previous_examples.examples]
+        previous_ruleset = RulesetLearner().learn_ruleset(previous_examples)
+
+        for i in range(10):
+            # Usually new examples, sometimes more of one already there
+            changed = random.sample(others, random.randint(1, 3))
+            if i % 3 == 0:
+                changed.append(random.choice(list(previous_examples.examples.keys())))
+
+            new_examples = ExampleSetOverlay(previous_examples)
+            new_examples.add_examples(changed)
+
+            expected = RulesetLearner().learn_ruleset(new_examples)
+            ruleset, growth = RulesetLearner().learn_ruleset_delta(previous_ruleset, previous_examples, new_examples, changed)
+
+            assert ruleset.rules_key() == expected.rules_key()
+            assert growth == sum(len(rule.context.nodes) for rule in expected.rules) - \
+                sum(len(rule.context.nodes) for rule in previous_ruleset.rules)
+
+
+if __name__ == "__main__":
+    test_incremental_heist()
+    test_incremental_prison()
+    test_first_example_without_objects()
+    test_version_only_changes_with_rules()
+    test_delta_relearn_matches_full()
@@ -0,0 +1,60 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the environment literal cache gives the same trees as building them, and that precomputing them
+doesn't change the environment
+"""
+
+import random
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from environment.prison_world import Prison
+
+
+def test_cached_literals_match_built():
+    random.seed(1)
+    np.random.seed(1)
+    env = Prison(stochastic=False)
+
+    for _ in range(500):
+        env.step(random.randint(0, env.get_num_actions() - 1))
+        if env.end_of_episode():
+            env.restart()
+
+    assert len(env.get_literals_cache()) > 0
+    for state in list(env.get_literals_cache()):
+        tree, name_map = env.get_literals(state)
+        built_tree, built_name_map = env.build_literals(state)
+        assert str(tree) == str(built_tree) and tree == built_tree
+        assert name_map == built_name_map
+
+
+def test_cache_cleared_when_names_change():
+    env = SymbolicHeist(stochastic=False, shuffle_object_names=True)
+    tree, _ = env.get_literals(env.get_state())
+
+    env.object_name_map = {name: name for name in env.object_name_map}
+    new_tree, _ = env.get_literals(env.get_state())
+
+    assert len(env.get_literals_cache()) == 1
+    assert str(new_tree) == str(env.build_literals(env.get_state())[0])
+
+
+def test_precompute_leaves_env_alone():
+    np.random.seed(2)
+    env = SymbolicHeist(stochastic=True)
+    state = list(env.curr_state)
+    random_state = np.random.get_state()[1].copy()
+
+    env.precompute_literals()
+
+    assert list(env.curr_state) == state and env.stochastic
+    assert (np.random.get_state()[1] == random_state).all()
+    assert len(env.get_literals_cache()) > 1
+
+
+if __name__ == "__main__":
+    test_cached_literals_match_built()
+    test_cache_cleared_when_names_change()
+    test_precompute_leaves_env_alone()
@@ -0,0 +1,82 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+The environment schema and the literals' reference lookups should find the same attributes as searching for them
+"""
+
+import random
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from environment.prison_world import Prison
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
+from test.test_incremental_learning import run_random_steps
+
+
+def search_reference(literals, reference):
+    # How SymbolicModel used to find the node: try every object of the class until the connection matches
+    test_id = 0
+    while True:
+        node = literals.node_lookup[reference.to_ob + str(test_id)]
+        edge = node.to_edges[0]
+        if reference.from_ob == edge.from_node.object_name and reference.edge_type == edge.type:
+            return node.full_name()
+        test_id += 1
+
+
+def test_references_and_attributes_match_search():
+    random.seed(5)
+    np.random.seed(5)
+
+    for env in [SymbolicHeist(stochastic=False), Prison(stochastic=False)]:
+        model = SymbolicModel(env)
+        run_random_steps(env, model, 300)
+        schema = env.get_schema()
+
+        checked = 0
+        for example in model.examples.examples:
+            literals = example.state
+            by_reference, by_edge_type = literals.references()
+
+            for edge in literals.base_object.edges:
+                first = next(e for e in literals.base_object.edges if e.type == edge.type)
+                assert by_edge_type[edge.type] == first.to_node.full_name()
+
+            for reference in example.outcome.value.keys():
+                if reference.edge_type is None:
+                    continue
+                key = (reference.from_ob, reference.edge_type, reference.to_ob)
+                assert by_reference[key] == search_reference(literals, reference)
+                checked += 1
+
+        assert checked > 0
+
+        for class_idx, class_name in enumerate(env.OB_NAMES):
+            for att_idx, att_name in enumerate(env.ATT_NAMES[class_idx]):
+                for instance_id, (start, _) in env.instance_index_map.items():
+                    assert schema.attribute(class_name, att_name, instance_id) == start + att_idx
+
+
+def test_grounded_outcomes_are_reused():
+    random.seed(6)
+    np.random.seed(6)
+    env = SymbolicHeist(stochastic=False)
+    model = SymbolicModel(env)
+    run_random_steps(env, model, 300)
+
+    effects = dict()
+    for state in list(env.get_literals_cache().keys()):
+        for action in range(env.get_num_actions()):
+            for transition in model.compute_possible_transitions(state, action):
+                if not transition.effect.is_no_effect():
+                    # Equal groundings are the same object
+                    key = str(transition.effect)
+                    assert effects.setdefault(key, transition.effect) is transition.effect
+
+    assert len(effects) > 0
+
+
+if __name__ == "__main__":
+    test_references_and_attributes_match_search()
+    test_grounded_outcomes_are_reused()
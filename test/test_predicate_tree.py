@@ -1,3 +1,5 @@
+import pickle
+
 import graphviz
 
 from symbolic_stochastic_domains.predicate_tree import PredicateTree, Node
@@ -26,6 +28,27 @@ def plot_predicate_tree(tree: PredicateTree, graph: graphviz.Digraph):
             graph.edge(node.object_name, node.object_name + str(prop), str(prop)[14:], color=("" if value else "red"))
 
 
+def test_copy_equality_and_pickle():
+    tree = PredicateTree()
+    tree.add_node("taxi0")
+    tree.add_node("wall0")
+    tree.add_node("lock0")
+    tree.add_edge("taxi0", "wall0", PredicateType.TOUCH_RIGHT)
+    tree.add_edge("taxi0", "lock0", PredicateType.TOUCH_UP)
+    tree.add_property("lock0", PredicateType.OPEN, True)
+
+    tree_copy = tree.copy()
+    assert tree_copy == tree and hash(tree_copy) == hash(tree) and str(tree_copy) == str(tree)
+
+    # Changing the copy has to change its key, and leave the original alone
+    tree_copy.add_property("lock0", PredicateType.OPEN, False)
+    assert tree_copy != tree
+
+    loaded = pickle.loads(pickle.dumps(tree))
+    assert loaded == tree and str(loaded) == str(tree)
+    assert context_matches(loaded, tree)
+
+
 if __name__ == "__main__":
     tree = PredicateTree()
     tree.add_node("taxi0")
@@ -0,0 +1,61 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+The ruleset's index should only throw out rules that couldn't apply anyway
+"""
+
+import random
+
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from environment.prison_world import Prison
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
+from symbolic_stochastic_domains.symbolic_classes import RuleSet
+from symbolic_stochastic_domains.symbolic_utils import context_matches
+from test.test_incremental_learning import run_random_steps
+
+
+def test_candidates_match_full_scan():
+    random.seed(4)
+    np.random.seed(4)
+
+    for env in [SymbolicHeist(stochastic=False), Prison(stochastic=False)]:
+        model = SymbolicModel(env)
+        run_random_steps(env, model, 300)
+        ruleset = model.ruleset
+
+        checked = 0
+        for literals, _ in env.get_literals_cache().values():
+            for action in range(env.get_num_actions()):
+                expected = [rule for rule in ruleset.rules if rule.action == action and context_matches(rule.context, literals)]
+                candidates = ruleset.candidate_rules(action, literals)
+                assert [rule for rule in candidates if context_matches(rule.context, literals)] == expected
+                assert ruleset.rules_for_action(action) == [rule for rule in ruleset.rules if rule.action == action]
+                checked += len(ruleset.rules_for_action(action)) - len(candidates)
+
+        # Some actually get skipped
+        assert checked > 0
+
+        # Adding a rule rebuilds it
+        partial = RuleSet(ruleset.rules[:-1])
+        assert ruleset.rules[-1] not in partial.rules_for_action(ruleset.rules[-1].action)
+        partial.add_rule(ruleset.rules[-1])
+        assert ruleset.rules[-1] in partial.rules_for_action(ruleset.rules[-1].action)
+
+        # So does setting the rules, and they can't be changed in place behind its back
+        key = partial.rules_key()
+        partial.rules = ruleset.rules[1:]
+        assert partial.rules_key() == key[1:]
+        assert ruleset.rules[0] not in partial.rules_for_action(ruleset.rules[0].action)
+        assert not hasattr(partial.rules, "append")
+
+        # Rulesets pickled with the rules as a list still load
+        old = RuleSet.__new__(RuleSet)
+        old.__setstate__({"rules": list(ruleset.rules), "default_rule_num_no_change": 0})
+        assert old.rules_key() == ruleset.rules_key()
+        assert old.rules_for_action(ruleset.rules[0].action) == ruleset.rules_for_action(ruleset.rules[0].action)
+
+
+if __name__ == "__main__":
+    test_candidates_match_full_scan()
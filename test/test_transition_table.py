@@ -0,0 +1,53 @@
+"""
+Created on 10/18/26 by Ethan Frank
+
+Checks the planner's transition table gives the same transitions as asking the model directly,
+and only forgets the actions whose rules changed
+"""
+
+import random
+import numpy as np
+
+from environment.symbolic_heist import SymbolicHeist
+from algorithm.symbolic_domains.symbolic_model import SymbolicModel
+from policy.transition_table import TransitionTable
+from symbolic_stochastic_domains.symbolic_classes import RuleSet
+from test.test_incremental_learning import run_random_steps
+
+
+def test_transition_table():
+    random.seed(1)
+    np.random.seed(1)
+    env = SymbolicHeist(stochastic=False)
+    model = SymbolicModel(env, incremental=True)
+    run_random_steps(env, model, 300)
+
+    table = TransitionTable(model, env.get_num_actions())
+    table.update()
+
+    states = list(env.get_literals_cache().keys())
+    for state in states:
+        for action in range(env.get_num_actions()):
+            next_state, reward = table.lookup(state, action)
+
+            transitions = model.compute_possible_transitions(state, action)
+            if len(transitions) == 0:
+                assert next_state is None
+            else:
+                assert next_state == model.next_state(state, transitions[0].effect)
+                assert reward == model.get_reward(state, next_state, action)
+
+    # Take away the rules for one action. Only that action should have to be recomputed
+    action = model.ruleset.rules[0].action
+    model.ruleset = RuleSet([rule for rule in model.ruleset.rules if rule.action != action])
+    table.update()
+
+    for other_action in range(env.get_num_actions()):
+        if other_action == action:
+            assert len(table.transitions[other_action]) == 0
+        else:
+            assert len(table.transitions[other_action]) == len(states)
+
+
+if __name__ == "__main__":
+    test_transition_table()